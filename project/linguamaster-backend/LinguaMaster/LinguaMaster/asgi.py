@@ -1,16 +1,25 @@
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from chat.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LinguaMaster.settings')
 
+# Populate the app registry before importing anything that touches models.
+django_asgi_app = get_asgi_application()
+
+# Load WHISPER_PRELOAD models before a pre-forking server forks its workers.
+from practice.model_pool import preload_models
+preload_models()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.auth import AuthMiddlewareStack
+from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
+from practice.routing import websocket_urlpatterns as practice_websocket_urlpatterns
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            websocket_urlpatterns
+            chat_websocket_urlpatterns + practice_websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
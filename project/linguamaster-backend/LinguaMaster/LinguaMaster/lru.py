@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from LinguaMaster.metrics import metrics
+
+
+class ProcessLRU:
+    """Process-local LRU of values compiled from database rows. get(*args)
+    returns build(*args), cached under key(*args); keys are tuples led by
+    the row's id so invalidate(id) can drop every entry for that row, and
+    should include whatever makes an edit from another process visible.
+    Hits and misses are counted as <metrics_prefix>.hits / .misses."""
+
+    def __init__(self, max_entries, build, key, metrics_prefix):
+        self.max_entries = max_entries
+        self.build = build
+        self.key = key
+        self.metrics_prefix = metrics_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, *args):
+        key = self.key(*args)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is not None:
+            metrics.incr(f'{self.metrics_prefix}.hits')
+            return value
+
+        metrics.incr(f'{self.metrics_prefix}.misses')
+        value = self.build(*args)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, row_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == row_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def lazy_lru(size_setting, build, key, metrics_prefix):
+    """Returns a getter for one ProcessLRU, created on first use so the
+    size is read from settings after they are configured."""
+    instance = None
+    lock = threading.Lock()
+
+    def get():
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = ProcessLRU(getattr(settings, size_setting), build, key, metrics_prefix)
+        return instance
+
+    return get
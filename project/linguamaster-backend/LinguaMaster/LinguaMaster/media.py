@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .metrics import metrics
+
+MEDIA_TOKEN_SALT = 'LinguaMaster.media'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def media_token(user, path):
+    # Bound to one path: a leaked URL opens that file and nothing else.
+    return signing.dumps({'u': str(user.pk), 'p': unquote(path)}, salt=MEDIA_TOKEN_SALT)
+
+
+def signed_media_url(path, user):
+    # <audio> and <video> elements cannot send an Authorization header.
+    return f'{path}?token={media_token(user, path)}'
+
+
+class MediaTokenAuthentication(BaseAuthentication):
+    """Authenticates ?token= from signed_media_url(), for the signed path only."""
+
+    def authenticate(self, request):
+        token = request.query_params.get('token')
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=MEDIA_TOKEN_SALT, max_age=settings.MEDIA_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            raise AuthenticationFailed('Invalid or expired media token')
+        if not isinstance(payload, dict) or payload.get('p') != request.path:
+            raise AuthenticationFailed('Media token is not valid for this path')
+
+        user = get_user_model().objects.filter(pk=payload.get('u'), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('Invalid or expired media token')
+        return user, None
+
+
+def parse_range(header, size):
+    """Returns (start, end) inclusive for a single byte range, None to send
+    the whole file, or False if the range cannot be satisfied."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    # Multiple ranges are rare for media; answering 200 is allowed.
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_media(request, name):
+    """Serves a file from MEDIA_ROOT with conditional and byte-range request
+    support, or hands it to the front end with MEDIA_SENDFILE. Callers check
+    permissions first."""
+    try:
+        path = default_storage.path(name)
+        st = os.stat(path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    last_modified = int(st.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        metrics.incr('media.not_modified')
+    else:
+        response = _file_response(request, name, path, st.st_size, etag, st.st_mtime)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Stored names are never reused, but access depends on the user.
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+def _file_response(request, name, path, size, etag, mtime):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE:
+        # The front end answers Range and HEAD itself from here on.
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        metrics.incr('media.offloaded')
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and _if_range_matches(request, etag, mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        metrics.observe('media.bytes_sent', size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        metrics.incr('media.range')
+        metrics.observe('media.bytes_sent', end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
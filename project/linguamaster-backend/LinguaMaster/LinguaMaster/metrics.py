@@ -0,0 +1,79 @@
+import threading
+from collections import deque
+
+
+def _pick(samples, pct):
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+class MetricsRegistry:
+    """Process-local counters, gauges and timings, exposed through /api/metrics/."""
+
+    def __init__(self, sample_size=1024):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = {
+                    'count': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'samples': deque(maxlen=self.sample_size),
+                }
+                self._timings[name] = timing
+            timing['count'] += 1
+            timing['total'] += value
+            timing['max'] = max(timing['max'], value)
+            timing['samples'].append(value)
+
+    def percentile(self, name, pct):
+        with self._lock:
+            timing = self._timings.get(name)
+            samples = sorted(timing['samples']) if timing else []
+        return _pick(samples, pct)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: dict(t, samples=sorted(t['samples']))
+                       for name, t in self._timings.items()}
+
+        summary = {}
+        for name, timing in timings.items():
+            samples = timing['samples']
+            summary[name] = {
+                'count': timing['count'],
+                'total': timing['total'],
+                'mean': timing['total'] / timing['count'] if timing['count'] else 0.0,
+                'max': timing['max'],
+                'p50': _pick(samples, 50),
+                'p95': _pick(samples, 95),
+            }
+
+        return {'counters': counters, 'gauges': gauges, 'timings': summary}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
@@ -87,6 +87,14 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Media is served by Django with permission checks, Range and conditional
+# requests. Behind nginx or Apache set MEDIA_SENDFILE to 'x-accel-redirect'
+# (with an internal location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# 'x-sendfile' so the front end sends the bytes. Signed ?token= media URLs
+# expire after MEDIA_TOKEN_MAX_AGE seconds.
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_TOKEN_MAX_AGE = int(os.environ.get('MEDIA_TOKEN_MAX_AGE', '3600'))
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
@@ -136,6 +144,135 @@ LOCALE_PATHS = [
     BASE_DIR / 'locale',
 ]
 
+# Speech recognition backend, imported lazily on first use. Web processes
+# built without torch/whisper can set
+# SPEECH_BACKEND=practice.speech_backends.DisabledBackend together with
+# SPEAKING_QUEUE_BACKEND=database and leave analysis to the worker processes.
+SPEECH_BACKEND = os.environ.get('SPEECH_BACKEND', 'practice.speech_backends.WhisperBackend')
+
+# Speech recognition: one warm model per size per worker process, shared by
+# at most WHISPER_MAX_CONCURRENCY concurrent transcriptions.
+WHISPER_MODEL_SIZE = os.environ.get('WHISPER_MODEL_SIZE', 'base')
+WHISPER_MAX_CONCURRENCY = int(os.environ.get('WHISPER_MAX_CONCURRENCY', '1'))
+WHISPER_POOL_TIMEOUT = float(os.environ.get('WHISPER_POOL_TIMEOUT', '30'))
+# Load-adaptive model choice: with e.g. WHISPER_MODEL_TIERS="tiny,base"
+# (fastest first) each request gets the most accurate tier whose recent p95
+# latency, stretched by the queued backlog, fits WHISPER_LATENCY_SLO_MS.
+WHISPER_MODEL_TIERS = [size for size in os.environ.get('WHISPER_MODEL_TIERS', '').split(',') if size]
+WHISPER_LATENCY_SLO_MS = int(os.environ.get('WHISPER_LATENCY_SLO_MS', '5000'))
+# Model sizes served as dynamically quantized int8 CPU models, e.g. "tiny,base".
+# Use `manage.py bench_speech_quantization` to check score drift first.
+WHISPER_INT8_MODELS = [size for size in os.environ.get('WHISPER_INT8_MODELS', '').split(',') if size]
+# With WHISPER_MMAP_WEIGHTS, fp32 CPU models are loaded from a memory-mapped
+# fp32 copy of the checkpoint (kept in WHISPER_MMAP_DIR) so all processes
+# share one physical copy of the weights. The copy is written on first load;
+# list the sizes in WHISPER_PRELOAD so that happens at startup rather than on
+# a request. Sizes in WHISPER_PRELOAD are loaded when the WSGI/ASGI
+# application is imported, i.e. before a pre-forking server (gunicorn
+# --preload) forks.
+WHISPER_MMAP_WEIGHTS = os.environ.get('WHISPER_MMAP_WEIGHTS', 'False') == 'True'
+WHISPER_MMAP_DIR = os.environ.get('WHISPER_MMAP_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'whisper', 'mmap'))
+WHISPER_PRELOAD = [size for size in os.environ.get('WHISPER_PRELOAD', '').split(',') if size]
+
+# Energy-based voice activity trim before transcription; clips with less than
+# SPEECH_VAD_MIN_SPEECH_MS above the threshold are rejected without inference.
+SPEECH_VAD_ENABLED = os.environ.get('SPEECH_VAD_ENABLED', 'True') == 'True'
+SPEECH_VAD_THRESHOLD_DB = float(os.environ.get('SPEECH_VAD_THRESHOLD_DB', '-45'))
+SPEECH_VAD_PADDING_MS = int(os.environ.get('SPEECH_VAD_PADDING_MS', '250'))
+SPEECH_VAD_MIN_SPEECH_MS = int(os.environ.get('SPEECH_VAD_MIN_SPEECH_MS', '200'))
+
+# Micro-batching: clips arriving within WHISPER_BATCH_MAX_WAIT_MS of each other
+# are decoded together, up to WHISPER_BATCH_MAX_SIZE per encoder pass.
+WHISPER_BATCHING = os.environ.get('WHISPER_BATCHING', 'False') == 'True'
+WHISPER_BATCH_MAX_SIZE = int(os.environ.get('WHISPER_BATCH_MAX_SIZE', '8'))
+WHISPER_BATCH_MAX_WAIT_MS = int(os.environ.get('WHISPER_BATCH_MAX_WAIT_MS', '20'))
+
+# Transcripts of previously seen audio, keyed by content hash, model size and
+# language. LocMemCache evicts in LRU order; culling one entry at a time keeps
+# it a strict LRU bounded at TRANSCRIPTION_CACHE_SIZE entries per process.
+TRANSCRIPTION_CACHE_ALIAS = 'transcriptions'
+TRANSCRIPTION_CACHE_SIZE = int(os.environ.get('TRANSCRIPTION_CACHE_SIZE', '2000'))
+
+# Read-only catalog responses (languages, courses, modules, lessons) are
+# cached under a per-course content version that model signals bump.
+# LocMemCache only sees bumps made in its own process, so with several
+# workers either use the file backend (CATALOG_CACHE_BACKEND=
+# django.core.cache.backends.filebased.FileBasedCache, CATALOG_CACHE_LOCATION
+# a shared directory) or accept up to CATALOG_CACHE_TIMEOUT of staleness.
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_LOCK_SECONDS = float(os.environ.get('CATALOG_CACHE_LOCK_SECONDS', '5'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    TRANSCRIPTION_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'transcriptions',
+        'TIMEOUT': int(os.environ.get('TRANSCRIPTION_CACHE_TIMEOUT', '86400')),
+        'OPTIONS': {
+            'MAX_ENTRIES': TRANSCRIPTION_CACHE_SIZE,
+            'CULL_FREQUENCY': TRANSCRIPTION_CACHE_SIZE,
+        },
+    },
+    CATALOG_CACHE_ALIAS: {
+        'BACKEND': os.environ.get('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300')),
+    },
+}
+
+# Speaking analysis runs off the request thread. 'database' queues jobs for
+# `manage.py run_speaking_workers`, 'local' runs them on an in-process thread
+# pool, 'sync' keeps the old blocking behaviour. With 'local', jobs still
+# queued when the process restarts are never picked up again; use it only
+# for development.
+SPEAKING_QUEUE_BACKEND = os.environ.get('SPEAKING_QUEUE_BACKEND', 'database')
+SPEAKING_LOCAL_WORKERS = int(os.environ.get('SPEAKING_LOCAL_WORKERS', '2'))
+SPEAKING_JOB_TIMEOUT = int(os.environ.get('SPEAKING_JOB_TIMEOUT', '300'))
+SPEAKING_JOB_MAX_TRIES = int(os.environ.get('SPEAKING_JOB_MAX_TRIES', '3'))
+# Uploads are streamed to disk; anything past this many bytes is rejected
+# with 413 while it is still arriving.
+SPEAKING_UPLOAD_MAX_BYTES = int(os.environ.get('SPEAKING_UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# Speaking audio housekeeping (`manage.py gc_speaking_audio`): unreferenced
+# files older than the grace period are deleted; attempt audio is
+# downsampled after DOWNSAMPLE_DAYS and dropped after RETENTION_DAYS
+# (0 disables either step).
+SPEAKING_AUDIO_GC_GRACE_HOURS = float(os.environ.get('SPEAKING_AUDIO_GC_GRACE_HOURS', '24'))
+SPEAKING_AUDIO_DOWNSAMPLE_DAYS = int(os.environ.get('SPEAKING_AUDIO_DOWNSAMPLE_DAYS', '30'))
+SPEAKING_AUDIO_RETENTION_DAYS = int(os.environ.get('SPEAKING_AUDIO_RETENTION_DAYS', '365'))
+# Optionally re-encode attempt audio as mono Opus once it has been analysed
+# (needs ffmpeg); `manage.py transcode_speaking_audio` backfills old attempts.
+SPEAKING_AUDIO_TRANSCODE = os.environ.get('SPEAKING_AUDIO_TRANSCODE', 'False') == 'True'
+SPEAKING_AUDIO_OPUS_BITRATE = os.environ.get('SPEAKING_AUDIO_OPUS_BITRATE', '24k')
+# Admission control for /api/practice/speaking/ (per process): requests past
+# the in-flight limit wait briefly in a small queue, then get 503 with
+# Retry-After. In the queued modes the pending job backlog is capped too.
+SPEAKING_MAX_IN_FLIGHT = int(os.environ.get('SPEAKING_MAX_IN_FLIGHT', '4'))
+SPEAKING_MAX_IN_FLIGHT_PER_USER = int(os.environ.get('SPEAKING_MAX_IN_FLIGHT_PER_USER', '1'))
+SPEAKING_ADMISSION_QUEUE = int(os.environ.get('SPEAKING_ADMISSION_QUEUE', '8'))
+SPEAKING_ADMISSION_WAIT_MS = int(os.environ.get('SPEAKING_ADMISSION_WAIT_MS', '500'))
+SPEAKING_RETRY_AFTER = int(os.environ.get('SPEAKING_RETRY_AFTER', '5'))
+SPEAKING_MAX_PENDING_JOBS = int(os.environ.get('SPEAKING_MAX_PENDING_JOBS', '200'))
+SPEAKING_MAX_PENDING_JOBS_PER_USER = int(os.environ.get('SPEAKING_MAX_PENDING_JOBS_PER_USER', '3'))
+
+# Live speaking over ws/practice/speaking/<exercise_id>/: the uncommitted
+# tail (at most WINDOW seconds) is re-transcribed every PARTIAL seconds of
+# new audio; streams are cut off after MAX seconds.
+SPEAKING_STREAM_WINDOW_SECONDS = float(os.environ.get('SPEAKING_STREAM_WINDOW_SECONDS', '10'))
+SPEAKING_STREAM_PARTIAL_SECONDS = float(os.environ.get('SPEAKING_STREAM_PARTIAL_SECONDS', '1'))
+SPEAKING_STREAM_MAX_SECONDS = int(os.environ.get('SPEAKING_STREAM_MAX_SECONDS', '120'))
+
+# Compiled reference texts (tokens, alignment tables, language hints) kept
+# per process for scoring, least recently used evicted first.
+SCORING_REFERENCE_CACHE_SIZE = int(os.environ.get('SCORING_REFERENCE_CACHE_SIZE', '1024'))
+
+# Written exercise answers are graded by matchers compiled once per exercise
+# version. Translations within ANSWER_FUZZY_THRESHOLD character similarity
+# of an accepted answer count as correct.
+ANSWER_MATCHER_CACHE_SIZE = int(os.environ.get('ANSWER_MATCHER_CACHE_SIZE', '4096'))
+ANSWER_FUZZY_THRESHOLD = float(os.environ.get('ANSWER_FUZZY_THRESHOLD', '0.85'))
+
 OPENAI_API_KEY = os.environ.get('')
 
 CHANNEL_LAYERS = {
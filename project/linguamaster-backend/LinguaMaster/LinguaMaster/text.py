@@ -0,0 +1,96 @@
+"""Text normalisation shared by answer checking and pronunciation scoring:
+word tokens, normalized character strings and a bit-parallel character
+edit distance."""
+import re
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+(?:['’-]\w+)*")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+class CompiledText:
+    """The reference side of an alignment, prepared once and reusable across
+    any number of hypotheses: word tokens and their ids, the normalized
+    character string and its bit-parallel pattern table."""
+
+    # Hypothesis words absent from the reference can never match.
+    UNKNOWN = -3
+
+    def __init__(self, text):
+        self.text = text
+        self.words = tokenize(text)
+        self.vocab = {}
+        self.word_ids = np.array([self.vocab.setdefault(word, len(self.vocab)) for word in self.words],
+                                 dtype=np.int32)
+        self.chars = ' '.join(self.words)
+        self.char_pattern = pattern_bits(self.chars)
+
+    def encode(self, words):
+        return np.array([self.vocab.get(word, self.UNKNOWN) for word in words], dtype=np.int32)
+
+
+def compiled(reference):
+    return reference if isinstance(reference, CompiledText) else CompiledText(reference)
+
+
+def pattern_bits(a):
+    peq = {}
+    for i, symbol in enumerate(a):
+        peq[symbol] = peq.get(symbol, 0) | (1 << i)
+    return peq
+
+
+def bit_parallel_distance(a, b, peq=None):
+    """Levenshtein distance between two sequences with Myers' bit-vector
+    algorithm (Hyyrö's formulation): one column of the DP per element of b,
+    with all len(a) cells of the column packed into a Python int. peq is
+    pattern_bits(a), if already at hand."""
+    m = len(a)
+    if not m:
+        return len(b)
+
+    if peq is None:
+        peq = pattern_bits(a)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+
+    pv, mv, score = mask, 0, m
+    for symbol in b:
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def char_similarity_batch(pairs):
+    """1 - normalized character edit distance (case and punctuation
+    insensitive) for each (reference, hypothesis) pair, in [0, 1]."""
+    similarities = []
+    for reference, hypothesis in pairs:
+        reference, hypothesis = compiled(reference), normalize(hypothesis)
+        longest = max(len(reference.chars), len(hypothesis))
+        distance = bit_parallel_distance(reference.chars, hypothesis, reference.char_pattern)
+        similarities.append(1.0 - distance / longest if longest else 1.0)
+    return similarities
+
+
+def char_similarity(reference, hypothesis):
+    return char_similarity_batch([(reference, hypothesis)])[0]
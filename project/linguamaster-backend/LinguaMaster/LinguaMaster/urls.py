@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from practice.views import MediaView
+from .views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,7 +13,6 @@ urlpatterns = [
     path('api/analytics/', include('analytics.urls')),
     path('api/chat/', include('chat.urls')),
     path('api/search/', include('search.urls')),
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", MediaView.as_view(), name='media'),
+]
\ No newline at end of file
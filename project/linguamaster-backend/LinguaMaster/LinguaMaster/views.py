@@ -0,0 +1,11 @@
+from rest_framework import views, permissions
+from rest_framework.response import Response
+
+from .metrics import metrics
+
+
+class MetricsView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
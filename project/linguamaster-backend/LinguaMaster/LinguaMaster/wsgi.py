@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LinguaMaster.settings')
 
 application = get_wsgi_application()
+
+# Load WHISPER_PRELOAD models before a pre-forking server forks its workers.
+from practice.model_pool import preload_models  # noqa: E402
+preload_models()
@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from LinguaMaster.pagination import KeysetPagination
+from chat.models import Conversation, Message
+from chat.serializers import MessageSerializer
+from users.models import User
+
+BENCH_GROUP = 'bench_pagination'
+
+
+class Command(BaseCommand):
+    help = 'Compare page-N latency of offset (page number) and keyset pagination of conversation messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000, 10000, 49999])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded conversation for the next run')
+
+    def handle(self, *args, **options):
+        conversation = self.seed(options['rows'])
+        queryset = conversation.messages.order_by('created_at', 'id')
+        size = options['page_size']
+        factory = APIRequestFactory(HTTP_HOST='localhost')
+
+        def offset_page(page):
+            paginator = PageNumberPagination()
+            paginator.page_size = size
+            request = Request(factory.get('/', {'page': page}))
+            rows = paginator.paginate_queryset(queryset, request)
+            return paginator.get_paginated_response(MessageSerializer(rows, many=True).data)
+
+        def keyset_page(token):
+            paginator = KeysetPagination()
+            paginator.page_size = size
+            request = Request(factory.get('/', {'cursor': token} if token else {}))
+            rows = paginator.paginate_queryset(queryset, request)
+            return paginator.get_paginated_response(MessageSerializer(rows, many=True).data)
+
+        keyset = KeysetPagination()
+        keyset.model = Message
+        keyset.ordering = keyset.get_ordering(queryset)
+
+        self.stdout.write(f"{options['rows']} messages, page size {size}, median of {options['repeat']}")
+        self.stdout.write(f"{'page':>7} {'offset ms':>10} {'keyset ms':>10} {'speedup':>8}")
+        for page in options['pages']:
+            start = (page - 1) * size
+            if start >= options['rows']:
+                continue
+            # The cursor a client would hold after reading the previous page
+            token = keyset.cursor_token(queryset[start - 1], reverse=False) if start else None
+
+            offset_ms = self.time(lambda: offset_page(page), options['repeat'])
+            keyset_ms = self.time(lambda: keyset_page(token), options['repeat'])
+            self.stdout.write(f'{page:>7} {offset_ms:10.2f} {keyset_ms:10.2f} {offset_ms / keyset_ms:7.1f}x')
+
+        if not options['keep']:
+            conversation.delete()
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def seed(self, rows):
+        user, _ = User.objects.get_or_create(
+            username=BENCH_GROUP, defaults={'email': f'{BENCH_GROUP}@example.com'}
+        )
+        conversation = Conversation.objects.filter(group_name=BENCH_GROUP).first()
+        if conversation is None:
+            conversation = Conversation.objects.create(is_group=True, group_name=BENCH_GROUP)
+            conversation.participants.set([user])
+
+        existing = conversation.messages.count()
+        if existing < rows:
+            self.stdout.write(f'Seeding {rows - existing} messages...')
+            for batch_start in range(existing, rows, 10000):
+                Message.objects.bulk_create(
+                    Message(conversation=conversation, sender=user, content=f'message {i}')
+                    for i in range(batch_start, min(rows, batch_start + 10000))
+                )
+        return conversation
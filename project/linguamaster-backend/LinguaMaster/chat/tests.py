@@ -1,3 +1,56 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import Conversation, Message
+
 
-# Create your tests here.
+class MessagePaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user])
+        
+        Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.user, content=str(i))
+            for i in range(45)
+        )
+        # Ten messages per timestamp: only the id tie-breaker orders them.
+        now = timezone.now()
+        for i, message_id in enumerate(Message.objects.values_list('id', flat=True)):
+            Message.objects.filter(id=message_id).update(created_at=now + timedelta(seconds=i // 10))
+        self.expected = list(
+            Message.objects.order_by('created_at', 'id').values_list('id', flat=True)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def _ids(self, response):
+        return [message['id'] for message in response.data['results']]
+    
+    def test_cursor_walks_every_message_once_in_both_directions(self):
+        url = f'/api/chat/messages/?conversation_id={self.conversation.id}&page_size=20'
+        pages = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                pages.append(response)
+                url = response.data['next']
+        
+        self.assertEqual([len(self._ids(page)) for page in pages], [20, 20, 5])
+        self.assertEqual(sum((self._ids(page) for page in pages), []), [str(i) for i in self.expected])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        
+        previous = self.client.get(pages[-1].data['previous'])
+        self.assertEqual(self._ids(previous), self._ids(pages[1]))
+        self.assertIsNone(pages[0].data['previous'])
+    
+    def test_garbage_cursor_is_not_found(self):
+        response = self.client.get(f'/api/chat/messages/?conversation_id={self.conversation.id}&cursor=abc')
+        self.assertEqual(response.status_code, 404)
@@ -5,6 +5,7 @@ from rest_framework.viewsets import ModelViewSet
 from django.db.models import Q
 from django.utils import timezone
 
+from LinguaMaster.pagination import KeysetPagination
 from .models import Conversation, Message
 from .serializers import (ConversationSerializer, MessageSerializer,
                          CreateConversationSerializer)
@@ -54,14 +55,12 @@ class ConversationViewSet(ModelViewSet):
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         conversation = self.get_object()
-        messages = conversation.messages.all().order_by('created_at')
-        page = self.paginate_queryset(messages)
-        if page is not None:
-            serializer = MessageSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = conversation.messages.all().order_by('created_at', 'id')
+        # Conversations themselves stay page-numbered; messages grow without bound
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        serializer = MessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -100,6 +99,7 @@ class ConversationViewSet(ModelViewSet):
 class MessageViewSet(ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         conversation_id = self.request.query_params.get('conversation_id')
@@ -107,5 +107,5 @@ class MessageViewSet(ModelViewSet):
             return Message.objects.filter(
                 conversation_id=conversation_id,
                 conversation__participants=self.request.user
-            ).order_by('created_at')
+            ).order_by('created_at', 'id')
         return Message.objects.none()
\ No newline at end of file
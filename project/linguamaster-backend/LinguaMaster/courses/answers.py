@@ -0,0 +1,116 @@
+import json
+import re
+import unicodedata
+
+from django.conf import settings
+
+from LinguaMaster.lru import lazy_lru
+from LinguaMaster.text import CompiledText, char_similarity, tokenize
+
+PUNCTUATION_RE = re.compile(r"[^\w]+")
+
+
+def normalize_answer(value):
+    """Case, accents, punctuation and spacing do not make an answer wrong."""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value).casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(PUNCTUATION_RE.sub(' ', text).split())
+
+
+def _load(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _as_text(answer):
+    # Fill-in-the-blank answers may come one blank per item.
+    if isinstance(answer, (list, tuple)):
+        return ' '.join(str(part) for part in answer)
+    return answer
+
+
+class AnswerMatcher:
+    """Every accepted form of one exercise's answer, normalized once. Exact
+    styles grade with a set lookup; translations fall back to the best
+    character similarity against the accepted variants."""
+
+    def __init__(self, exercise_type, correct_answer, acceptable_answers=(), options=None):
+        self.exercise_type = exercise_type
+        variants = [correct_answer, *(acceptable_answers or [])]
+
+        if exercise_type == 'matching':
+            self.pairs = {self._pairs(_load(variant)) for variant in variants}
+            self.pairs.discard(None)
+            return
+
+        self.accepted = {normalize_answer(_as_text(_load(variant))) for variant in variants}
+        self.accepted.discard('')
+        if exercise_type == 'multiple_choice':
+            self.accepted.update(self._option_keys(options))
+        if exercise_type == 'translation':
+            self.compiled = [CompiledText(variant) for variant in sorted(self.accepted)]
+
+    def _option_keys(self, options):
+        # Clients may send the chosen option's index or id instead of its
+        # text, but a key that reads as another option's text (index 1 of
+        # ['2', '4', '1']) is ambiguous and is only accepted as text.
+        choices = []
+        for index, option in enumerate(options or []):
+            if isinstance(option, dict):
+                text = option.get('text', option.get('value', option.get('label')))
+                key = option.get('id', index)
+            else:
+                text, key = option, index
+            choices.append((normalize_answer(text), normalize_answer(key)))
+        texts = {text for text, _ in choices}
+        return {key for text, key in choices if text in self.accepted and key not in texts}
+
+    @staticmethod
+    def _pairs(value):
+        if isinstance(value, dict):
+            items = value.items()
+        elif isinstance(value, (list, tuple)):
+            items = [tuple(item) for item in value if isinstance(item, (list, tuple)) and len(item) == 2]
+        else:
+            return None
+        return frozenset((normalize_answer(left), normalize_answer(right)) for left, right in items)
+
+    def grade(self, answer):
+        """Returns (is_correct, similarity in [0, 1])."""
+        if self.exercise_type == 'matching':
+            correct = self._pairs(_load(answer)) in self.pairs
+            return correct, 1.0 if correct else 0.0
+
+        normalized = normalize_answer(_as_text(answer))
+        if normalized in self.accepted:
+            return True, 1.0
+        if self.exercise_type != 'translation' or not normalized or not self.compiled:
+            return False, 0.0
+
+        # Typos may pass on character similarity; an added or dropped word
+        # ("not", "never") may not, however close the strings are.
+        words = len(tokenize(normalized))
+        similarity, correct = 0.0, False
+        for compiled in self.compiled:
+            score = char_similarity(compiled, normalized)
+            similarity = max(similarity, score)
+            if len(compiled.words) == words and score >= settings.ANSWER_FUZZY_THRESHOLD:
+                correct = True
+        return correct, similarity
+
+
+def _build_matcher(exercise):
+    return AnswerMatcher(exercise.exercise_type, exercise.correct_answer,
+                         exercise.acceptable_answers, exercise.options)
+
+
+# Keyed by (exercise id, updated_at); the Exercise signals in
+# courses.signals drop entries edited in this process.
+get_answer_index = lazy_lru('ANSWER_MATCHER_CACHE_SIZE', _build_matcher,
+                            lambda exercise: (exercise.pk, exercise.updated_at), 'answers.matcher')
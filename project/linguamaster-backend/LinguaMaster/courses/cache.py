@@ -0,0 +1,103 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from LinguaMaster.metrics import metrics
+
+# Languages and course listings; everything under one course has its own.
+CATALOG_SCOPE = 'catalog'
+
+
+def course_scope(course_id):
+    return f'course:{course_id}' if course_id else CATALOG_SCOPE
+
+
+def _cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _version_key(scope):
+    return f'catalog:version:{scope}'
+
+
+def get_version(scope):
+    cache = _cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock, not from 1: if a version is ever evicted, a
+        # fresh one must not collide with keys written under the old one.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope):
+    cache = _cache()
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    metrics.incr('catalog.cache.invalidations')
+
+
+def get_or_build(key, build):
+    """Returns the cached value for key, or the result of build(). Only one
+    caller per key builds at a time; the others wait for its result for up
+    to CATALOG_CACHE_LOCK_SECONDS before giving up and building too.
+    build() returns (value, cacheable)."""
+    cache = _cache()
+    value = cache.get(key)
+    if value is not None:
+        metrics.incr('catalog.cache.hits')
+        return value
+
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.CATALOG_CACHE_LOCK_SECONDS
+    if not cache.add(lock_key, 1, timeout=lock_timeout):
+        metrics.incr('catalog.cache.waits')
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(key)
+            if value is not None:
+                metrics.incr('catalog.cache.hits')
+                return value
+        lock_key = None
+
+    metrics.incr('catalog.cache.misses')
+    try:
+        value, cacheable = build()
+        if cacheable:
+            cache.set(key, value)
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    return value
+
+
+def catalog_cached(method):
+    """Caches the data of a read-only viewset action under the content
+    version of self.get_cache_scope()."""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        scope = self.get_cache_scope()
+        # Paginated responses embed absolute links, hence the host.
+        location = hashlib.sha1(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+        key = f'catalog:{scope}:{get_version(scope)}:{type(self).__name__}.{method.__name__}:{location}'
+
+        response = None
+
+        def build():
+            nonlocal response
+            response = method(self, request, *args, **kwargs)
+            return response.data, response.status_code == 200
+
+        data = get_or_build(key, build)
+        return response if response is not None else Response(data)
+    return wrapper
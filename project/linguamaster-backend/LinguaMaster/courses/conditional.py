@@ -0,0 +1,112 @@
+import hashlib
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from LinguaMaster.metrics import metrics
+
+
+def aggregate_validators(queryset, *prefixes):
+    """(last modified, count) of the rows a response is built from, for each
+    related path in prefixes, in one aggregate query. The count catches
+    deletions, which max() cannot."""
+    prefixes = prefixes or ('',)
+    result = queryset.aggregate(**{
+        key: aggregate
+        for i, prefix in enumerate(prefixes)
+        for key, aggregate in (
+            (f'last_modified_{i}', Max(f'{prefix}updated_at')),
+            (f'count_{i}', Count(f'{prefix}id', distinct=True)),
+        )
+    })
+    return [
+        {'last_modified': result[f'last_modified_{i}'], 'count': result[f'count_{i}']}
+        for i in range(len(prefixes))
+    ]
+
+
+def make_validators(*parts):
+    """Builds (weak ETag, Last-Modified timestamp) from aggregate results."""
+    stamps = [part['last_modified'] for part in parts if part['last_modified']]
+    last_modified = int(max(stamps).timestamp()) if stamps else None
+    digest = hashlib.sha1(repr([
+        (part['last_modified'] and part['last_modified'].isoformat(), part['count'])
+        for part in parts
+    ]).encode()).hexdigest()[:20]
+    return f'W/"{digest}"', last_modified
+
+
+def conditional(get_validators):
+    """Answers If-None-Match / If-Modified-Since on a viewset action from
+    get_validators(view, request, **kwargs) -> (etag, last_modified), before
+    the body is built or serialized."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = get_validators(self, request, **kwargs)
+            is_conditional = 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+            if is_conditional:
+                metrics.incr('courses.conditional.requests')
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                if response.status_code == 304:
+                    metrics.incr('courses.conditional.not_modified')
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients must revalidate, which is now cheap.
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _prefixes(view):
+    # The view's own rows plus any it nests, e.g. a course's 'language__'.
+    return ('', *getattr(view, 'conditional_related', ()))
+
+
+def list_validators(view, request, **kwargs):
+    return make_validators(*aggregate_validators(view.filter_queryset(view.get_queryset()), *_prefixes(view)))
+
+
+def _filter_pk(queryset, pk):
+    # Validators run before get_object(); answer a malformed pk the same way.
+    try:
+        return queryset.filter(pk=pk)
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+def detail_validators(view, request, pk=None, **kwargs):
+    return make_validators(*aggregate_validators(_filter_pk(view.get_queryset(), pk), *_prefixes(view)))
+
+
+def children_validators(model, parent_field):
+    """Validators for a detail action listing the object's active children.
+    The object itself is included, so deactivating it still changes them."""
+    def get_validators(view, request, pk=None, **kwargs):
+        queryset = _filter_pk(view.get_queryset(), pk)
+        return make_validators(
+            *aggregate_validators(queryset),
+            *aggregate_validators(model.objects.filter(**{parent_field: pk, 'is_active': True}))
+        )
+    return get_validators
+
+
+def course_tree_validators(view, request, pk=None, **kwargs):
+    # Inactive rows are included: deactivating one still bumps updated_at.
+    return make_validators(*aggregate_validators(
+        _filter_pk(view.get_queryset(), pk),
+        '', 'language__', 'modules__', 'modules__lessons__', 'modules__lessons__exercises__'
+    ))
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from courses.cache import CATALOG_SCOPE, bump_version, course_scope
+from courses.models import Course, Lesson, Exercise
+
+UPDATE_FIELDS = ['total_lessons', 'total_exercises', 'total_minutes', 'estimated_hours', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.total_lessons, total_exercises, total_minutes and estimated_hours from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift, change nothing')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # One grouped query per table, whatever the number of courses.
+        lessons = {
+            row['module__course_id']: row
+            for row in Lesson.objects.filter(is_active=True, module__is_active=True)
+            .values('module__course_id').annotate(count=Count('id'), minutes=Sum('duration_minutes'))
+        }
+        exercises = dict(
+            Exercise.objects.filter(is_active=True, lesson__is_active=True, lesson__module__is_active=True)
+            .values('lesson__module__course_id').annotate(count=Count('id'))
+            .values_list('lesson__module__course_id', 'count')
+        )
+
+        now = timezone.now()
+        scanned = 0
+        changed = []
+        for course in Course.objects.only(*UPDATE_FIELDS).iterator(chunk_size=options['batch_size']):
+            scanned += 1
+            lesson_row = lessons.get(course.id, {})
+            minutes = lesson_row.get('minutes') or 0
+            totals = (
+                lesson_row.get('count', 0),
+                exercises.get(course.id, 0),
+                minutes,
+                (Decimal(minutes) / 60).quantize(Decimal('0.01')),
+            )
+            if totals == (course.total_lessons, course.total_exercises, course.total_minutes,
+                          course.estimated_hours):
+                continue
+            (course.total_lessons, course.total_exercises, course.total_minutes,
+             course.estimated_hours) = totals
+            course.updated_at = now
+            changed.append(course)
+
+        if changed and not options['dry_run']:
+            with transaction.atomic():
+                Course.objects.bulk_update(changed, UPDATE_FIELDS, batch_size=options['batch_size'])
+            for course in changed:
+                bump_version(course_scope(course.id))
+            bump_version(CATALOG_SCOPE)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(changed)} of {scanned} courses had drifted"
+            + (' (dry run, nothing written)' if options['dry_run'] else ', fixed')
+        ))
@@ -0,0 +1,35 @@
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+
+from .models import Course, Lesson, Exercise, MediaReference
+
+MEDIA_FIELDS = {
+    Course: ('thumbnail_url',),
+    Lesson: ('content_url', 'thumbnail_url'),
+    Exercise: ('question_audio_url', 'question_image_url'),
+}
+OWNER_FIELDS = {Course: 'course', Lesson: 'lesson', Exercise: 'exercise'}
+
+
+def media_name(url):
+    """Storage name of a URL pointing into MEDIA_URL (on any host), or None."""
+    if not url:
+        return None
+    prefix = f"/{settings.MEDIA_URL.strip('/')}/"
+    path = unquote(urlsplit(url).path)
+    if not path.startswith(prefix) or len(path) == len(prefix):
+        return None
+    return path[len(prefix):]
+
+
+def sync_media_references(instance):
+    names = {media_name(getattr(instance, field)) for field in MEDIA_FIELDS[type(instance)]}
+    names.discard(None)
+    owner = {OWNER_FIELDS[type(instance)]: instance}
+
+    references = MediaReference.objects.filter(**owner)
+    if set(references.values_list('name', flat=True)) == names:
+        return
+    references.delete()
+    MediaReference.objects.bulk_create([MediaReference(name=name, **owner) for name in names])
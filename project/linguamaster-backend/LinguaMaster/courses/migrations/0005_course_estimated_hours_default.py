@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='estimated_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:36
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_total_minutes(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    minutes = (
+        Lesson.objects.filter(is_active=True, module__is_active=True)
+        .values('module__course_id').annotate(minutes=Sum('duration_minutes'))
+        .values_list('module__course_id', 'minutes')
+    )
+    for course_id, total in minutes:
+        Course.objects.filter(id=course_id).update(total_minutes=total or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_estimated_hours_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_minutes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from courses.media import MEDIA_FIELDS, OWNER_FIELDS, media_name
+
+
+def backfill_media_references(apps, schema_editor):
+    MediaReference = apps.get_model('courses', 'MediaReference')
+    references = []
+    for model, fields in MEDIA_FIELDS.items():
+        owner = OWNER_FIELDS[model]
+        rows = apps.get_model('courses', model.__name__).objects.values_list('id', *fields)
+        for owner_id, *urls in rows.iterator():
+            names = {media_name(url) for url in urls} - {None}
+            references.extend(MediaReference(name=name, **{f'{owner}_id': owner_id}) for name in names)
+    MediaReference.objects.bulk_create(references, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_language_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=500)),
+                ('course', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+                ('exercise', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.exercise')),
+                ('lesson', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.lesson')),
+            ],
+            options={
+                'db_table': 'media_references',
+            },
+        ),
+        migrations.RunPython(backfill_media_references, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,8 @@ class Language(models.Model):
     native_name = models.CharField(max_length=50)
     flag_emoji = models.CharField(max_length=10)
     is_active = models.BooleanField(default=True)
+    # Courses nest their language, so their ETags include this too.
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'languages'
@@ -30,9 +32,12 @@ class Course(models.Model):
         ('advanced', 'Advanced')
     ], default='beginner')
     
-    estimated_hours = models.DecimalField(max_digits=5, decimal_places=2, default=10.0)
+    estimated_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     total_lessons = models.IntegerField(default=0)
     total_exercises = models.IntegerField(default=0)
+    # Exact sum behind estimated_hours, which is derived from it on every
+    # change so rounding never accumulates.
+    total_minutes = models.IntegerField(default=0)
     
     is_free = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
@@ -46,6 +51,10 @@ class Course(models.Model):
     
     class Meta:
         db_table = 'courses'
+        indexes = [
+            # Keyset pagination of the course list (newest first)
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -59,6 +68,8 @@ class Module(models.Model):
     estimated_minutes = models.IntegerField(default=60)
     is_active = models.BooleanField(default=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         db_table = 'modules'
         ordering = ['order_index']
@@ -135,9 +146,23 @@ class Exercise(models.Model):
     order_index = models.IntegerField()
     is_active = models.BooleanField(default=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         db_table = 'exercises'
         ordering = ['order_index']
     
     def __str__(self):
-        return f"{self.lesson.title} - {self.title}"
\ No newline at end of file
+        return f"{self.lesson.title} - {self.title}"
+class MediaReference(models.Model):
+    """A file under MEDIA_ROOT linked from course content, by storage name.
+    Exactly one of course (its thumbnail), lesson or exercise is set; kept
+    in sync by courses.signals so the media view can authorize a path with
+    one indexed lookup."""
+    name = models.CharField(max_length=500, db_index=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, related_name='+')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, related_name='+')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, null=True, related_name='+')
+    
+    class Meta:
+        db_table = 'media_references'
@@ -1,12 +1,60 @@
 from rest_framework import serializers
 from .models import Language, Course, Module, Lesson, Exercise
 
+def _query_list(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """Lets clients pick fields with ?fields=a,b or drop them with ?omit=c.
+    Lists default to Meta.list_fields when set, leaving heavy fields to the
+    detail view. Views pass the same choice to defer_unused() so that the
+    columns behind dropped fields are never selected."""
+    
+    @classmethod
+    def select_fields(cls, request, many):
+        names = list(getattr(cls.Meta, 'list_fields', cls.Meta.fields) if many else cls.Meta.fields)
+        requested = _query_list(request, 'fields')
+        if requested is not None:
+            names = [name for name in cls.Meta.fields if name in requested]
+        omitted = _query_list(request, 'omit')
+        if omitted:
+            names = [name for name in names if name not in omitted]
+        return names
+    
+    @classmethod
+    def deferred_columns(cls, names):
+        used = set()
+        for name in names:
+            field = cls._declared_fields.get(name)
+            used.add((field.source if field is not None and field.source else name).split('.')[0])
+        return [
+            field.name for field in cls.Meta.model._meta.concrete_fields
+            if not field.primary_key and field.name not in used and field.attname not in used
+        ]
+    
+    @classmethod
+    def defer_unused(cls, queryset, request, many):
+        deferred = cls.deferred_columns(cls.select_fields(request, many))
+        return queryset.defer(*deferred) if deferred else queryset
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        many = isinstance(self.parent, serializers.ListSerializer)
+        if self.parent is not None and not many:
+            # Nested inside another serializer: not the client's to pick
+            return fields
+        keep = set(self.select_fields(self.context.get('request'), many))
+        return {name: field for name, field in fields.items() if name in keep}
+
 class LanguageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Language
         fields = ['id', 'code', 'name', 'native_name', 'flag_emoji']
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     language = LanguageSerializer(read_only=True)
     language_id = serializers.UUIDField(write_only=True)
     
@@ -17,13 +65,13 @@ class CourseSerializer(serializers.ModelSerializer):
                  'total_exercises', 'is_free', 'is_featured', 'is_active',
                  'created_at']
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Module
         fields = ['id', 'course', 'title', 'description', 'order_index',
                  'estimated_minutes', 'is_active']
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lesson
         fields = ['id', 'module', 'title', 'content_type', 'content_url',
@@ -31,12 +79,47 @@ class LessonSerializer(serializers.ModelSerializer):
                  'difficulty_level', 'order_index', 'is_active',
                  'learning_objectives', 'key_vocabulary', 'grammar_points',
                  'created_at']
+        list_fields = ['id', 'module', 'title', 'content_type', 'content_url',
+                      'thumbnail_url', 'duration_minutes', 'difficulty_level',
+                      'order_index', 'is_active', 'created_at']
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Exercise
         fields = ['id', 'lesson', 'exercise_type', 'title', 'instructions',
                  'question_text', 'question_audio_url', 'question_image_url',
                  'options', 'correct_answer', 'acceptable_answers',
                  'points', 'time_limit_seconds', 'max_attempts',
-                 'hints', 'explanation', 'order_index', 'is_active']
\ No newline at end of file
+                 'hints', 'explanation', 'order_index', 'is_active']
+        list_fields = ['id', 'lesson', 'exercise_type', 'title', 'instructions',
+                      'question_text', 'question_audio_url', 'question_image_url',
+                      'options', 'correct_answer', 'acceptable_answers',
+                      'points', 'time_limit_seconds', 'max_attempts',
+                      'order_index', 'is_active']
+
+class ExerciseSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Exercise
+        fields = ['id', 'exercise_type', 'title', 'points', 'time_limit_seconds',
+                 'max_attempts', 'order_index']
+
+class LessonTreeSerializer(serializers.ModelSerializer):
+    exercises = ExerciseSummarySerializer(source='active_exercises', many=True, read_only=True)
+    
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'content_type', 'thumbnail_url', 'duration_minutes',
+                 'difficulty_level', 'order_index', 'exercises']
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    lessons = LessonTreeSerializer(source='active_lessons', many=True, read_only=True)
+    
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'description', 'order_index', 'estimated_minutes', 'lessons']
+
+class CourseTreeSerializer(CourseSerializer):
+    modules = ModuleTreeSerializer(source='active_modules', many=True, read_only=True)
+    
+    class Meta(CourseSerializer.Meta):
+        fields = CourseSerializer.Meta.fields + ['modules']
@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import CATALOG_SCOPE, bump_version, course_scope
+from .models import Language, Course, Module, Lesson, Exercise
+from . import stats
+from .media import sync_media_references
+from .answers import get_answer_index
+
+
+def _bump(*scopes):
+    # After commit, so nobody caches the old rows under the new version.
+    transaction.on_commit(lambda: [bump_version(scope) for scope in scopes])
+
+
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def language_changed(sender, instance, **kwargs):
+    # Course details and trees nest the language and are cached per course.
+    course_ids = Course.objects.filter(language_id=instance.pk).values_list('id', flat=True)
+    _bump(CATALOG_SCOPE, *(course_scope(course_id) for course_id in course_ids))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    _bump(CATALOG_SCOPE, course_scope(instance.pk))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Exercise)
+def media_links_changed(sender, instance, **kwargs):
+    sync_media_references(instance)
+
+
+@receiver(pre_save, sender=Module)
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Exercise)
+def capture_course_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stats.capture(instance)
+
+
+@receiver(pre_delete, sender=Module)
+@receiver(pre_delete, sender=Lesson)
+@receiver(pre_delete, sender=Exercise)
+def capture_course_stats_on_delete(sender, instance, **kwargs):
+    stats.capture(instance, deleting=True)
+
+
+def _record_course_stats(instance, deleted, raw=False):
+    # Course listings show the totals, so they go stale too.
+    if not raw and stats.record(instance, deleted=deleted):
+        _bump(CATALOG_SCOPE)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, signal, raw=False, **kwargs):
+    _record_course_stats(instance, signal is post_delete, raw)
+    _bump(course_scope(instance.course_id))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, signal, raw=False, **kwargs):
+    _record_course_stats(instance, signal is post_delete, raw)
+    course_id = Module.objects.filter(id=instance.module_id).values_list('course_id', flat=True).first()
+    _bump(course_scope(course_id))
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def exercise_changed(sender, instance, signal, raw=False, **kwargs):
+    get_answer_index().invalidate(instance.pk)
+    _record_course_stats(instance, signal is post_delete, raw)
+    course_id = Lesson.objects.filter(id=instance.lesson_id).values_list(
+        'module__course_id', flat=True
+    ).first()
+    _bump(course_scope(course_id))
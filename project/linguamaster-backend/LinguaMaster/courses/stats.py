@@ -0,0 +1,97 @@
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Now
+
+from .models import Course, Module, Lesson, Exercise
+
+# Course.total_lessons, total_exercises and total_minutes count active
+# lessons and exercises under active modules; estimated_hours is
+# total_minutes / 60, recomputed from the exact minutes in the same UPDATE.
+# The handlers below keep them current with F() deltas inside the saving
+# transaction. queryset.update() and bulk_create() bypass them;
+# `manage.py reconcile_course_stats` recomputes everything.
+
+ZERO = (0, 0, 0)
+
+
+def apply_delta(course_id, lessons=0, exercises=0, minutes=0):
+    if not course_id or not (lessons or exercises or minutes):
+        return False
+    # updated_at too, so ETags and Last-Modified move with the numbers
+    Course.objects.filter(id=course_id).update(
+        total_lessons=F('total_lessons') + lessons,
+        total_exercises=F('total_exercises') + exercises,
+        total_minutes=F('total_minutes') + minutes,
+        estimated_hours=Cast(F('total_minutes') + minutes, FloatField()) / 60,
+        updated_at=Now()
+    )
+    return True
+
+
+def apply_change(before, after):
+    """before and after are (course_id, (lessons, exercises, minutes))."""
+    if before[0] == after[0]:
+        return apply_delta(after[0], *(new - old for old, new in zip(before[1], after[1])))
+    changed = apply_delta(before[0], *(-old for old in before[1]))
+    return apply_delta(after[0], *after[1]) or changed
+
+
+def _active_exercises(lesson_ids):
+    return Exercise.objects.filter(lesson_id__in=lesson_ids, is_active=True).count()
+
+
+# The *_state() functions return (course_id, (lessons, exercises, minutes))
+# for a row as currently stored, or None if there is no such row. With
+# children=False a row's lessons and exercises are left out: on delete they
+# are cascaded and counted down by their own handlers.
+
+def lesson_state(lesson, children=True):
+    row = Lesson.objects.filter(id=lesson.pk).values(
+        'is_active', 'duration_minutes', 'module__course_id', 'module__is_active'
+    ).first()
+    if row is None:
+        return None
+    if not (row['is_active'] and row['module__is_active']):
+        return row['module__course_id'], ZERO
+    exercises = _active_exercises([lesson.pk]) if children else 0
+    return row['module__course_id'], (1, exercises, row['duration_minutes'])
+
+
+def exercise_state(exercise, children=True):
+    row = Exercise.objects.filter(id=exercise.pk).values(
+        'is_active', 'lesson__is_active', 'lesson__module__is_active', 'lesson__module__course_id'
+    ).first()
+    if row is None:
+        return None
+    counted = row['is_active'] and row['lesson__is_active'] and row['lesson__module__is_active']
+    return row['lesson__module__course_id'], (0, 1, 0) if counted else ZERO
+
+
+def module_state(module, children=True):
+    row = Module.objects.filter(id=module.pk).values('course_id', 'is_active').first()
+    if row is None:
+        return None
+    if not (row['is_active'] and children):
+        return row['course_id'], ZERO
+    lessons = Lesson.objects.filter(module_id=module.pk, is_active=True)
+    totals = lessons.aggregate(lessons=Count('id'), minutes=Sum('duration_minutes'))
+    exercises = _active_exercises(lessons.values('id'))
+    return row['course_id'], (totals['lessons'], exercises, totals['minutes'] or 0)
+
+
+STATE_FUNCTIONS = {Module: module_state, Lesson: lesson_state, Exercise: exercise_state}
+
+
+def capture(instance, deleting=False):
+    """Called before a save or delete; remembers the row's contribution."""
+    if instance._state.adding and not deleting:
+        instance._course_stats_before = None
+    else:
+        instance._course_stats_before = STATE_FUNCTIONS[type(instance)](instance, children=not deleting)
+
+
+def record(instance, deleted=False):
+    """Called after the save or delete; applies the difference. Returns
+    whether any course's totals changed."""
+    before = getattr(instance, '_course_stats_before', None) or (None, ZERO)
+    after = (None, ZERO) if deleted else STATE_FUNCTIONS[type(instance)](instance) or (None, ZERO)
+    return apply_change(before, after)
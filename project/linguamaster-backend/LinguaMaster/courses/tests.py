@@ -1,3 +1,323 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from LinguaMaster.metrics import metrics
+from .answers import AnswerMatcher, get_answer_index
+from .cache import CATALOG_SCOPE
+from .models import Language, Course, Module, Lesson, Exercise
+from .views import LessonViewSet, ModuleViewSet
+
+
+class CourseTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        self.course = Course.objects.create(language=language, title='French A1', description='Basics')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caches[settings.CATALOG_CACHE_ALIAS].clear()
+    
+    def _grow(self, modules, lessons, exercises):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create(modules, lessons, exercises)
+    
+    def _create(self, modules, lessons, exercises):
+        start = self.course.modules.count()
+        for m in range(start, start + modules):
+            module = Module.objects.create(course=self.course, title=f'Module {m}', order_index=m)
+            for l in range(lessons):
+                lesson = Lesson.objects.create(module=module, title=f'Lesson {l}', order_index=l)
+                for e in range(exercises):
+                    Exercise.objects.create(lesson=lesson, exercise_type='translation', title=f'Exercise {e}',
+                                            correct_answer='bonjour', order_index=e)
+    
+    def _get_tree(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/courses/courses/{self.course.id}/tree/')
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+    
+    def test_query_count_does_not_grow_with_the_tree(self):
+        self._grow(1, 1, 1)
+        small, small_queries = self._get_tree()
+        
+        self._grow(4, 3, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Module.objects.create(course=self.course, title='Hidden', order_index=99, is_active=False)
+        large, large_queries = self._get_tree()
+        
+        self.assertEqual(small_queries, large_queries)
+        # One per level, plus the validator aggregate for conditional GETs
+        self.assertLessEqual(large_queries, 5)
+        self.assertEqual(len(large['modules']), 5)
+        self.assertEqual(len(large['modules'][-1]['lessons']), 3)
+        self.assertEqual(len(large['modules'][-1]['lessons'][0]['exercises']), 5)
+        self.assertNotIn('correct_answer', large['modules'][0]['lessons'][0]['exercises'][0])
+    
+    def test_cached_tree_is_dropped_when_content_changes(self):
+        self._grow(1, 1, 1)
+        self._get_tree()
+        
+        tree, queries = self._get_tree()
+        self.assertEqual(queries, 1)
+        
+        lesson = Lesson.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercise.objects.create(lesson=lesson, exercise_type='translation', title='New',
+                                    correct_answer='salut', order_index=5)
+        
+        tree, queries = self._get_tree()
+        self.assertGreater(queries, 1)
+        self.assertEqual(len(tree['modules'][0]['lessons'][0]['exercises']), 2)
+    
+    def test_unchanged_tree_is_not_modified(self):
+        self._grow(2, 2, 2)
+        url = f'/api/courses/courses/{self.course.id}/tree/'
+        etag = self.client.get(url)['ETag']
+        
+        not_modified = metrics.snapshot()['counters'].get('courses.conditional.not_modified', 0)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(metrics.snapshot()['counters']['courses.conditional.not_modified'], not_modified + 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercise.objects.filter(title='Exercise 1').first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_language_edit_changes_course_etags(self):
+        urls = ['/api/courses/courses/', f'/api/courses/courses/{self.course.id}/',
+                f'/api/courses/courses/{self.course.id}/tree/']
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.language.name = 'Français'
+            self.course.language.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            course = response.data['results'][0] if 'results' in response.data else response.data
+            self.assertEqual(course['language']['name'], 'Français')
+    
+    def test_malformed_pk_falls_back_to_catalog_scope(self):
+        for viewset in (ModuleViewSet, LessonViewSet):
+            view = viewset(kwargs={'pk': 'not-a-uuid'}, request=None)
+            self.assertEqual(view.get_cache_scope(), CATALOG_SCOPE)
+    
+    def test_malformed_pk_is_not_found(self):
+        for path in ('courses/not-a-uuid', 'courses/not-a-uuid/tree', 'courses/not-a-uuid/modules',
+                     'modules/not-a-uuid', 'modules/not-a-uuid/lessons',
+                     'lessons/not-a-uuid', 'lessons/not-a-uuid/exercises', 'exercises/not-a-uuid'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(f'/api/courses/{path}/').status_code, 404)
+
+
+class CoursePaginationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        for i in range(12):
+            Course.objects.create(language=language, title=f'Course {i}', description='Basics')
+        Course.objects.create(language=language, title='Retired', description='Basics', is_active=False)
+        # Four courses per timestamp: only the id tie-breaker orders them.
+        now = timezone.now()
+        for i, course_id in enumerate(Course.objects.values_list('id', flat=True)):
+            Course.objects.filter(id=course_id).update(created_at=now - timedelta(seconds=i // 4))
+        self.expected = [
+            str(course_id) for course_id in
+            Course.objects.filter(is_active=True).order_by('-created_at', '-id').values_list('id', flat=True)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        caches[settings.CATALOG_CACHE_ALIAS].clear()
+    
+    def test_cursor_walks_every_course_once_across_ties(self):
+        url = '/api/courses/courses/?page_size=5'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([str(course['id']) for course in response.data['results']])
+            url = response.data['next']
+        
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+        
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([str(course['id']) for course in previous.data['results']], pages[1])
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        self.module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        for i in range(3):
+            Lesson.objects.create(module=self.module, title=f'Lesson {i}', order_index=i,
+                                  content_text='long text ' * 1000, key_vocabulary=['bonjour'] * 100)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        caches[settings.CATALOG_CACHE_ALIAS].clear()
+    
+    def _get(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/courses/lessons/?module_id={self.module.id}{query}')
+        self.assertEqual(response.status_code, 200)
+        lesson_sql = [q['sql'] for q in queries.captured_queries if 'FROM "lessons"' in q['sql']]
+        return response.data['results'], ' '.join(lesson_sql), len(queries)
+    
+    def test_list_leaves_heavy_columns_in_the_database(self):
+        lessons, sql, query_count = self._get('')
+        self.assertNotIn('content_text', lessons[0])
+        self.assertNotIn('content_text', sql)
+        self.assertNotIn('key_vocabulary', sql)
+        
+        lessons, sql, _ = self._get('&fields=id,title')
+        self.assertEqual(set(lessons[0]), {'id', 'title'})
+        self.assertNotIn('content_url', sql)
+        
+        lessons, sql, more_queries = self._get('&fields=id,content_text&omit=id')
+        self.assertEqual(set(lessons[0]), {'content_text'})
+        self.assertEqual(more_queries, query_count)
+    
+    def test_detail_keeps_every_field(self):
+        lesson = Lesson.objects.first()
+        response = self.client.get(f'/api/courses/lessons/{lesson.id}/?module_id={self.module.id}')
+        self.assertIn('content_text', response.data)
+        self.assertIn('grammar_points', response.data)
+
+
+class CourseStatsTests(TestCase):
+    def setUp(self):
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        self.course = Course.objects.create(language=language, title='French A1', description='Basics')
+    
+    def _totals(self):
+        self.course.refresh_from_db()
+        return self.course.total_lessons, self.course.total_exercises, self.course.estimated_hours
+    
+    def _lesson(self, module, minutes, exercises):
+        lesson = Lesson.objects.create(module=module, title='Lesson', order_index=1, duration_minutes=minutes)
+        for i in range(exercises):
+            Exercise.objects.create(lesson=lesson, exercise_type='translation', title='Exercise',
+                                    correct_answer='bonjour', order_index=i)
+        return lesson
+    
+    def test_totals_follow_inserts_activation_and_deletes(self):
+        module = Module.objects.create(course=self.course, title='Greetings', order_index=1)
+        first = self._lesson(module, 30, 2)
+        self._lesson(module, 15, 3)
+        self.assertEqual(self._totals(), (2, 5, Decimal('0.75')))
+        
+        first.is_active = False
+        first.save()
+        self.assertEqual(self._totals(), (1, 3, Decimal('0.25')))
+        
+        module.is_active = False
+        module.save()
+        self.assertEqual(self._totals(), (0, 0, Decimal('0')))
+        
+        module.is_active = True
+        module.save()
+        first.exercises.first().delete()
+        first.is_active = True
+        first.save()
+        self.assertEqual(self._totals(), (2, 4, Decimal('0.75')))
+        
+        module.delete()
+        self.assertEqual(self._totals(), (0, 0, Decimal('0')))
+    
+    def test_hours_do_not_drift_with_odd_minutes(self):
+        module = Module.objects.create(course=self.course, title='Greetings', order_index=1)
+        for _ in range(10):
+            self._lesson(module, 7, 0)
+        self.assertEqual(self._totals(), (10, 0, Decimal('1.17')))
+        
+        module.lessons.first().delete()
+        self.assertEqual(self._totals(), (9, 0, Decimal('1.05')))
+    
+    def test_reconcile_fixes_drift(self):
+        module = Module.objects.create(course=self.course, title='Greetings', order_index=1)
+        self._lesson(module, 20, 2)
+        Course.objects.update(total_lessons=7, total_exercises=0)
+        
+        call_command('reconcile_course_stats', stdout=StringIO())
+        self.assertEqual(self._totals(), (1, 2, Decimal('0.33')))
+
+
+class AnswerMatcherTests(SimpleTestCase):
+    def test_exact_types_ignore_case_accents_and_spacing(self):
+        matcher = AnswerMatcher('fill_blank', "À l'école", ['a la maison'])
+        self.assertEqual(matcher.grade('  a L ECOLE '), (True, 1.0))
+        self.assertEqual(matcher.grade('À la maison!'), (True, 1.0))
+        self.assertFalse(matcher.grade('au parc')[0])
+    
+    def test_multiple_choice_accepts_option_index_or_id(self):
+        matcher = AnswerMatcher('multiple_choice', 'chat', options=['chien', 'chat'])
+        self.assertTrue(matcher.grade('1')[0])
+        self.assertFalse(matcher.grade('0')[0])
+        matcher = AnswerMatcher('multiple_choice', 'chat', options=[{'id': 'b', 'text': 'Chat'}])
+        self.assertTrue(matcher.grade('b')[0])
+    
+    def test_multiple_choice_index_never_shadows_another_options_text(self):
+        matcher = AnswerMatcher('multiple_choice', '4', options=['2', '4', '1', '3'])
+        self.assertTrue(matcher.grade('4')[0])
+        self.assertFalse(matcher.grade('1')[0])
+    
+    def test_matching_ignores_pair_order(self):
+        matcher = AnswerMatcher('matching', '{"chat": "cat", "chien": "dog"}')
+        self.assertTrue(matcher.grade([['Chien', 'dog'], ['chat', 'Cat']])[0])
+        self.assertFalse(matcher.grade({'chat': 'dog', 'chien': 'cat'})[0])
+    
+    def test_translation_tolerates_small_typos(self):
+        matcher = AnswerMatcher('translation', 'I would like a coffee please')
+        correct, similarity = matcher.grade('I would like a cofee please')
+        self.assertTrue(correct)
+        self.assertLess(similarity, 1.0)
+        self.assertFalse(matcher.grade('I want tea')[0])
+    
+    def test_translation_refuses_added_or_dropped_words(self):
+        matcher = AnswerMatcher('translation', 'I would like a coffee please')
+        correct, similarity = matcher.grade('I would not like a coffee please')
+        self.assertFalse(correct)
+        self.assertGreater(similarity, 0.85)
+        self.assertFalse(matcher.grade('I would like coffee please')[0])
+
+
+class ExerciseAttemptTests(TestCase):
+    def test_attempt_uses_acceptable_answers_and_recompiles_on_edit(self):
+        user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        exercise = Exercise.objects.create(lesson=lesson, exercise_type='fill_blank', title='Hello',
+                                           correct_answer='Bonjour', acceptable_answers=['salut'],
+                                           order_index=1)
+        get_answer_index().clear()
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/courses/exercises/{exercise.id}/attempt/?lesson_id={lesson.id}'
+        
+        self.assertTrue(client.post(url, {'answer': 'Salut!'}).data['is_correct'])
+        
+        exercise.acceptable_answers = []
+        exercise.save()
+        response = client.post(url, {'answer': 'Salut!'})
+        self.assertFalse(response.data['is_correct'])
+        self.assertEqual(response.data['score'], 0)
@@ -1,21 +1,78 @@
+import json
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, Q
 
+from LinguaMaster.pagination import KeysetPagination
+from .answers import get_answer_index
+from .cache import CATALOG_SCOPE, catalog_cached, course_scope
+from .conditional import (conditional, list_validators, detail_validators,
+                          children_validators, course_tree_validators)
 from .models import Language, Course, Module, Lesson, Exercise
-from .serializers import (LanguageSerializer, CourseSerializer,
+from .serializers import (LanguageSerializer, CourseSerializer, CourseTreeSerializer,
                          ModuleSerializer, LessonSerializer, ExerciseSerializer)
 
+def course_id_of(model, pk, path='course_id'):
+    # A malformed pk has no course; the view itself answers it with a 404.
+    try:
+        return model.objects.filter(id=pk).values_list(path, flat=True).first()
+    except (ValueError, ValidationError):
+        return None
+
+def course_tree_prefetches():
+    # One query per level however big the course is; the serializers read
+    # the to_attr lists, never the related managers.
+    exercises = Exercise.objects.filter(is_active=True).only(
+        'id', 'lesson_id', 'exercise_type', 'title', 'points', 'time_limit_seconds',
+        'max_attempts', 'order_index'
+    ).order_by('order_index')
+    lessons = Lesson.objects.filter(is_active=True).only(
+        'id', 'module_id', 'title', 'content_type', 'thumbnail_url', 'duration_minutes',
+        'difficulty_level', 'order_index'
+    ).order_by('order_index').prefetch_related(
+        Prefetch('exercises', queryset=exercises, to_attr='active_exercises')
+    )
+    modules = Module.objects.filter(is_active=True).order_by('order_index').prefetch_related(
+        Prefetch('lessons', queryset=lessons, to_attr='active_lessons')
+    )
+    return [Prefetch('modules', queryset=modules, to_attr='active_modules')]
+
+class SparseFieldsViewMixin:
+    """Pushes ?fields= / ?omit= (and the compact list shape) of the
+    serializer down into the queryset as .defer()."""
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        return self.get_serializer_class().defer_unused(queryset, self.request, many=self.action == 'list')
+
 class LanguageViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Language.objects.filter(is_active=True)
     serializer_class = LanguageSerializer
     permission_classes = [permissions.AllowAny]
+    
+    def get_cache_scope(self):
+        return CATALOG_SCOPE
+    
+    @catalog_cached
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @catalog_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+class CourseViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.filter(is_active=True)
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # CourseSerializer nests the language.
+    conditional_related = ('language__',)
     
     def get_queryset(self):
         language = self.request.query_params.get('language')
@@ -36,16 +93,42 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
                 Q(description__icontains=search)
             )
         
-        return queryset.order_by('-created_at')
+        if self.action == 'tree':
+            queryset = queryset.select_related('language').prefetch_related(*course_tree_prefetches())
+        
+        return queryset.order_by('-created_at', '-id')
+    
+    def get_cache_scope(self):
+        return course_scope(self.kwargs.get('pk'))
+    
+    @conditional(list_validators)
+    @catalog_cached
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(detail_validators)
+    @catalog_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @conditional(course_tree_validators)
+    @catalog_cached
+    def tree(self, request, pk=None):
+        course = self.get_object()
+        return Response(CourseTreeSerializer(course).data)
+    
+    @action(detail=True, methods=['get'])
+    @conditional(children_validators(Module, 'course_id'))
+    @catalog_cached
     def modules(self, request, pk=None):
         course = self.get_object()
         modules = course.modules.filter(is_active=True).order_by('order_index')
-        serializer = ModuleSerializer(modules, many=True)
+        modules = ModuleSerializer.defer_unused(modules, request, many=True)
+        serializer = ModuleSerializer(modules, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class ModuleViewSet(viewsets.ReadOnlyModelViewSet):
+class ModuleViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Module.objects.filter(is_active=True)
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -59,14 +142,32 @@ class ModuleViewSet(viewsets.ReadOnlyModelViewSet):
             ).order_by('order_index')
         return Module.objects.none()
     
+    def get_cache_scope(self):
+        if 'pk' in self.kwargs:
+            return course_scope(course_id_of(Module, self.kwargs['pk']))
+        return course_scope(self.request.query_params.get('course_id'))
+    
+    @conditional(list_validators)
+    @catalog_cached
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(detail_validators)
+    @catalog_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @conditional(children_validators(Lesson, 'module_id'))
+    @catalog_cached
     def lessons(self, request, pk=None):
         module = self.get_object()
         lessons = module.lessons.filter(is_active=True).order_by('order_index')
-        serializer = LessonSerializer(lessons, many=True)
+        lessons = LessonSerializer.defer_unused(lessons, request, many=True)
+        serializer = LessonSerializer(lessons, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class LessonViewSet(viewsets.ReadOnlyModelViewSet):
+class LessonViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Lesson.objects.filter(is_active=True)
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -80,11 +181,29 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
             ).order_by('order_index')
         return Lesson.objects.none()
     
+    def get_cache_scope(self):
+        if 'pk' in self.kwargs:
+            return course_scope(course_id_of(Lesson, self.kwargs['pk'], 'module__course_id'))
+        return course_scope(course_id_of(Module, self.request.query_params.get('module_id')))
+    
+    @conditional(list_validators)
+    @catalog_cached
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(detail_validators)
+    @catalog_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @conditional(children_validators(Exercise, 'lesson_id'))
+    @catalog_cached
     def exercises(self, request, pk=None):
         lesson = self.get_object()
         exercises = lesson.exercises.filter(is_active=True).order_by('order_index')
-        serializer = ExerciseSerializer(exercises, many=True)
+        exercises = ExerciseSerializer.defer_unused(exercises, request, many=True)
+        serializer = ExerciseSerializer(exercises, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
@@ -106,7 +225,7 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response({'success': True, 'progress_id': str(progress.id)})
 
-class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
+class ExerciseViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Exercise.objects.filter(is_active=True)
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -120,18 +239,30 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
             ).order_by('order_index')
         return Exercise.objects.none()
     
+    @conditional(list_validators)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def attempt(self, request, pk=None):
         exercise = self.get_object()
         user_answer = request.data.get('answer')
+        is_correct, similarity = get_answer_index().get(exercise).grade(user_answer)
+        if user_answer is not None and not isinstance(user_answer, str):
+            # Matching pairs and multi-blank answers arrive as JSON
+            user_answer = json.dumps(user_answer)
         
         from practice.models import ExerciseAttempt
         attempt = ExerciseAttempt.objects.create(
             student=request.user,
             exercise=exercise,
             user_answer=user_answer,
-            is_correct=user_answer == exercise.correct_answer,
-            score=exercise.points if user_answer == exercise.correct_answer else 0
+            is_correct=is_correct,
+            score=exercise.points if is_correct else 0
         )
         
         return Response({
@@ -139,5 +270,6 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
             'attempt_id': str(attempt.id),
             'is_correct': attempt.is_correct,
             'score': attempt.score,
+            'similarity': round(similarity, 3),
             'explanation': exercise.explanation
         })
\ No newline at end of file
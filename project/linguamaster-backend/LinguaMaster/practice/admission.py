@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from LinguaMaster.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f'Speaking analysis is at capacity ({reason}), retry in {retry_after}s')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds how many speaking requests this process works on at once.
+
+    Up to max_in_flight requests run; up to max_waiting more wait at most
+    wait_timeout seconds for a slot; anything beyond that is rejected
+    straight away. A single user never holds more than per_user slots
+    (running or waiting), so one client cannot crowd out the others."""
+
+    def __init__(self, max_in_flight, per_user, max_waiting, wait_timeout, retry_after):
+        self.max_in_flight = max_in_flight
+        self.per_user = per_user
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._by_user = Counter()
+
+    def _shed(self, reason):
+        metrics.incr('speaking.admission.shed')
+        metrics.incr(f'speaking.admission.shed.{reason}')
+        raise AdmissionRejected(reason, self.retry_after)
+
+    def _publish(self):
+        metrics.set_gauge('speaking.admission.in_flight', self._in_flight)
+        metrics.set_gauge('speaking.admission.waiting', self._waiting)
+
+    def acquire(self, user_key):
+        """Takes a slot for user_key, waiting up to wait_timeout; raises
+        AdmissionRejected. Every successful acquire() needs a release()."""
+        with self._cond:
+            if self._by_user[user_key] >= self.per_user:
+                self._shed('per_user')
+            if self._in_flight >= self.max_in_flight:
+                if self._waiting >= self.max_waiting:
+                    self._shed('capacity')
+
+                self._by_user[user_key] += 1
+                self._waiting += 1
+                self._publish()
+                metrics.incr('speaking.admission.queued')
+                started = time.monotonic()
+                try:
+                    has_slot = self._cond.wait_for(
+                        lambda: self._in_flight < self.max_in_flight, self.wait_timeout
+                    )
+                finally:
+                    self._waiting -= 1
+                    metrics.observe('speaking.admission.wait_seconds', time.monotonic() - started)
+                if not has_slot:
+                    self._release_user(user_key)
+                    self._publish()
+                    self._shed('timeout')
+            else:
+                self._by_user[user_key] += 1
+
+            self._in_flight += 1
+            self._publish()
+        metrics.incr('speaking.admission.admitted')
+
+    def release(self, user_key):
+        with self._cond:
+            self._in_flight -= 1
+            self._release_user(user_key)
+            self._publish()
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, user_key):
+        self.acquire(user_key)
+        try:
+            yield
+        finally:
+            self.release(user_key)
+
+    def _release_user(self, user_key):
+        self._by_user[user_key] -= 1
+        if self._by_user[user_key] <= 0:
+            del self._by_user[user_key]
+
+
+def check_job_backlog(user):
+    """In the queued modes a request only holds its slot for the upload; the
+    real capacity is the job queue, so shed once too much is pending there.
+
+    Views call this before the upload as a cheap early check, and
+    enqueue_speaking_job calls it again with the user's row locked, which
+    makes the per-user limit exact. The global limit stays check-then-insert:
+    it can be overshot by at most the number of uploads in flight across all
+    processes, which SPEAKING_MAX_IN_FLIGHT already bounds."""
+    from .models import SpeakingJob
+
+    pending = SpeakingJob.objects.filter(status__in=('queued', 'running'))
+    retry_after = settings.SPEAKING_RETRY_AFTER
+    if pending.filter(student=user).count() >= settings.SPEAKING_MAX_PENDING_JOBS_PER_USER:
+        metrics.incr('speaking.admission.shed')
+        metrics.incr('speaking.admission.shed.per_user_backlog')
+        raise AdmissionRejected('per_user_backlog', retry_after)
+    if pending.count() >= settings.SPEAKING_MAX_PENDING_JOBS:
+        metrics.incr('speaking.admission.shed')
+        metrics.incr('speaking.admission.shed.backlog')
+        raise AdmissionRejected('backlog', retry_after)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    max_in_flight=settings.SPEAKING_MAX_IN_FLIGHT,
+                    per_user=settings.SPEAKING_MAX_IN_FLIGHT_PER_USER,
+                    max_waiting=settings.SPEAKING_ADMISSION_QUEUE,
+                    wait_timeout=settings.SPEAKING_ADMISSION_WAIT_MS / 1000,
+                    retry_after=settings.SPEAKING_RETRY_AFTER
+                )
+    return _controller
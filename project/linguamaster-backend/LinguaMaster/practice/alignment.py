@@ -0,0 +1,147 @@
+"""Edit-distance alignment between a reference text and a transcription.
+
+The dynamic programme is filled one reference position (row) at a time, with
+every column of that row -- and every pair of a batch -- computed by a few
+NumPy operations. The left-to-right insertion dependency inside a row is
+resolved with a running minimum:
+
+    D[i, j] = min over k <= j of (t[k] + j - k)
+            = j + minimum.accumulate(t - arange)[j]
+
+where t[k] is the best of the deletion and substitution moves into cell k.
+Character-level similarity only needs the distance, not the alignment; see
+LinguaMaster.text.
+"""
+import numpy as np
+
+from LinguaMaster.text import compiled, tokenize
+
+# Pairs are aligned in chunks of similar length so that padding stays small.
+# A chunk's padded DP matrices hold at most CELL_BUDGET int32 cells (16 MB),
+# whatever the passage length; a single pair larger than that gets a chunk
+# of its own.
+CELL_BUDGET = 4 * 1024 * 1024
+# Below this many cells a lone pair is cheaper in plain Python than through
+# NumPy's per-call overhead.
+SCALAR_CELLS = 1024
+
+
+def _pad(sequences, fill):
+    width = max((len(seq) for seq in sequences), default=0)
+    padded = np.full((len(sequences), width), fill, dtype=np.int32)
+    for row, seq in enumerate(sequences):
+        padded[row, :len(seq)] = seq
+    return padded
+
+
+def _next_row(prev, i, ref_tokens, hyp, steps):
+    cost = hyp != ref_tokens[:, None]
+    t = np.empty_like(prev)
+    t[:, 0] = i
+    np.minimum(prev[:, 1:] + 1, prev[:, :-1] + cost, out=t[:, 1:])
+    return np.minimum.accumulate(t - steps, axis=1) + steps
+
+
+def _distance_matrix(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    matrix = [previous]
+    for i, ref_token in enumerate(ref, 1):
+        row = [i]
+        for j, hyp_token in enumerate(hyp, 1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token)))
+        matrix.append(row)
+        previous = row
+    return matrix
+
+
+def _distance_matrices(refs, hyps):
+    ref, hyp = _pad(refs, -1), _pad(hyps, -2)
+    steps = np.arange(hyp.shape[1] + 1, dtype=np.int32)
+
+    matrices = np.empty((len(refs), ref.shape[1] + 1, hyp.shape[1] + 1), dtype=np.int32)
+    matrices[:, 0] = steps
+    for i in range(1, ref.shape[1] + 1):
+        matrices[:, i] = _next_row(matrices[:, i - 1], i, ref[:, i - 1], hyp, steps)
+    return matrices
+
+
+def _backtrace(matrix, reference, hypothesis):
+    i, j = len(reference), len(hypothesis)
+    operations = []
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            same = reference[i - 1] == hypothesis[j - 1]
+            if matrix[i][j] == matrix[i - 1][j - 1] + (not same):
+                operations.append(('equal' if same else 'substitute', reference[i - 1], hypothesis[j - 1]))
+                i, j = i - 1, j - 1
+                continue
+        if i > 0 and matrix[i][j] == matrix[i - 1][j] + 1:
+            operations.append(('delete', reference[i - 1], None))
+            i -= 1
+        else:
+            operations.append(('insert', None, hypothesis[j - 1]))
+            j -= 1
+    operations.reverse()
+    return operations
+
+
+def _summarize(operations, reference):
+    counts = {'equal': 0, 'substitute': 0, 'delete': 0, 'insert': 0}
+    for op, _, _ in operations:
+        counts[op] += 1
+    errors = counts['substitute'] + counts['delete'] + counts['insert']
+    return {
+        'hits': counts['equal'],
+        'substitutions': counts['substitute'],
+        'deletions': counts['delete'],
+        'insertions': counts['insert'],
+        'reference_words': len(reference),
+        'wer': errors / max(len(reference), 1) * 100,
+        'operations': [
+            {'op': op, 'reference': ref_word, 'hypothesis': hyp_word}
+            for op, ref_word, hyp_word in operations
+        ],
+    }
+
+
+def _chunks(pairs, size_of):
+    # Every matrix in a chunk is padded to the chunk's longest reference and
+    # hypothesis, so the budget is checked against the padded shape.
+    order = sorted(range(len(pairs)), key=lambda index: size_of(pairs[index]))
+    chunk, rows, columns = [], 0, 0
+    for index in order:
+        ref_len, hyp_len = size_of(pairs[index])
+        new_rows, new_columns = max(rows, ref_len + 1), max(columns, hyp_len + 1)
+        if chunk and (len(chunk) + 1) * new_rows * new_columns > CELL_BUDGET:
+            yield chunk
+            chunk, new_rows, new_columns = [], ref_len + 1, hyp_len + 1
+        chunk.append(index)
+        rows, columns = new_rows, new_columns
+    if chunk:
+        yield chunk
+
+
+def align_words_batch(pairs):
+    """Aligns (reference, hypothesis) text pairs word by word; references may
+    be CompiledText. Returns one dict per pair with hit/substitution/
+    deletion/insertion counts, WER (in percent of reference words) and the
+    operations in reference order."""
+    tokenized = [(compiled(reference), tokenize(hypothesis)) for reference, hypothesis in pairs]
+    results = [None] * len(pairs)
+
+    for chunk in _chunks(tokenized, lambda pair: (len(pair[0].words), len(pair[1]))):
+        refs = [tokenized[index][0].word_ids for index in chunk]
+        hyps = [tokenized[index][0].encode(tokenized[index][1]) for index in chunk]
+        if len(chunk) == 1 and (len(refs[0]) + 1) * (len(hyps[0]) + 1) <= SCALAR_CELLS:
+            matrices = [_distance_matrix(refs[0].tolist(), hyps[0].tolist())]
+        else:
+            matrices = _distance_matrices(refs, hyps)
+        for matrix, index in zip(matrices, chunk):
+            reference, hypothesis = tokenized[index]
+            operations = _backtrace(matrix, reference.words, hypothesis)
+            results[index] = _summarize(operations, reference.words)
+    return results
+
+
+def align_words(reference, hypothesis):
+    return align_words_batch([(reference, hypothesis)])[0]
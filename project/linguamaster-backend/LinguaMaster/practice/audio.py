@@ -0,0 +1,51 @@
+import numpy as np
+
+from .speech_backends import SAMPLE_RATE
+
+FRAME_MS = 30
+# Frames this far below the loudest frame count as silence even when they
+# clear the absolute floor (room noise on a loud recording).
+RELATIVE_THRESHOLD_DB = 35
+
+
+def frame_energies_db(audio, sample_rate=SAMPLE_RATE):
+    frame = int(sample_rate * FRAME_MS / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.empty(0), frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame).astype(np.float64)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    return 20 * np.log10(rms), frame
+
+
+def trim_silence(audio, threshold_db=-45, padding_ms=250, min_speech_ms=200,
+                 sample_rate=SAMPLE_RATE):
+    """Energy-based voice activity trim. Returns (trimmed_audio, report);
+    trimmed_audio is None when no frame clears the threshold for at least
+    min_speech_ms."""
+    energies, frame = frame_energies_db(audio, sample_rate)
+    original_seconds = len(audio) / sample_rate
+
+    voiced = np.empty(0, dtype=int)
+    if len(energies):
+        threshold = max(threshold_db, energies.max() - RELATIVE_THRESHOLD_DB)
+        voiced = np.flatnonzero(energies > threshold)
+
+    if len(voiced) * FRAME_MS < min_speech_ms:
+        return None, {
+            'original_seconds': original_seconds,
+            'kept_seconds': 0.0,
+            'trimmed_seconds': original_seconds,
+        }
+
+    padding = int(sample_rate * padding_ms / 1000)
+    start = max(0, int(voiced[0]) * frame - padding)
+    end = min(len(audio), (int(voiced[-1]) + 1) * frame + padding)
+    kept_seconds = (end - start) / sample_rate
+
+    return audio[start:end], {
+        'original_seconds': original_seconds,
+        'kept_seconds': kept_seconds,
+        'trimmed_seconds': original_seconds - kept_seconds,
+        'start_seconds': start / sample_rate,
+    }
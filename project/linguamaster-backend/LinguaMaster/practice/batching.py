@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from LinguaMaster.metrics import metrics
+from .model_pool import get_model_pool
+from .speech_backends import WINDOW_SAMPLES, get_speech_backend
+
+
+class _Clip:
+    def __init__(self, audio, language):
+        self.audio = audio
+        self.language = language
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """Collects clips from concurrent callers for up to max_wait_ms (or until
+    max_batch_size clips are waiting) and decodes them in one encoder pass."""
+
+    def __init__(self, pool, model_size, max_batch_size=8, max_wait_ms=20, backend=None):
+        self.pool = pool
+        self.backend = backend or get_speech_backend()
+        self.model_size = model_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, language, timeout=None):
+        if isinstance(audio, str):
+            audio = self.backend.load_audio(audio)
+
+        # Batches are decoded as single 30 second windows; longer clips go
+        # through the backend's sliding-window transcribe instead.
+        if len(audio) > WINDOW_SAMPLES:
+            metrics.incr('speech.batch.bypassed')
+            with self.pool.borrow(self.model_size) as model:
+                return self.backend.transcribe(model, audio, language)
+
+        self._ensure_started()
+        clip = _Clip(audio, language)
+        self._queue.put(clip)
+        return {'text': clip.future.result(timeout)}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name=f'whisper-batcher-{self.model_size}',
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            by_language = defaultdict(list)
+            for clip in self._collect():
+                by_language[clip.language].append(clip)
+
+            for language, clips in by_language.items():
+                self._run_batch(language, clips)
+
+    def _run_batch(self, language, clips):
+        started = time.monotonic()
+        for clip in clips:
+            metrics.observe('speech.batch.queue_seconds', started - clip.enqueued_at)
+        metrics.observe('speech.batch.size', len(clips))
+
+        try:
+            with self.pool.borrow(self.model_size) as model:
+                texts = self.backend.decode_batch(model, [clip.audio for clip in clips], language)
+        except Exception as e:
+            for clip in clips:
+                clip.future.set_exception(e)
+            return
+
+        for clip, text in zip(clips, texts):
+            clip.future.set_result(text)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_size):
+    batcher = _batchers.get(model_size)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model_size)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    get_model_pool(),
+                    model_size,
+                    max_batch_size=settings.WHISPER_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.WHISPER_BATCH_MAX_WAIT_MS
+                )
+                _batchers[model_size] = batcher
+    return batcher
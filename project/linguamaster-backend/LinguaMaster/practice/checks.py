@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def speech_backend_check(app_configs, **kwargs):
+    if (settings.SPEECH_BACKEND.endswith('DisabledBackend')
+            and settings.SPEAKING_QUEUE_BACKEND != 'database'):
+        return [Warning(
+            'Speech recognition is disabled but speaking analysis runs in-process.',
+            hint="Set SPEAKING_QUEUE_BACKEND='database' and run manage.py run_speaking_workers "
+                 "with a speech backend enabled.",
+            id='practice.W001',
+        )]
+    return []
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import wave
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+from LinguaMaster.metrics import metrics
+from courses.models import Exercise
+from .admission import AdmissionRejected, get_admission_controller
+from .audio import frame_energies_db
+from .jobs import analysis_summary, record_speaking_attempt, schedule_transcode
+from .reference_index import CompiledReference
+from .services import SpeechRecognitionService
+from .speech_backends import SAMPLE_RATE, model_variant
+from .uploads import speaking_storage_name
+
+logger = logging.getLogger(__name__)
+
+# Audio leaving the window is cut at the quietest frame of its last stretch,
+# so that committed segments rarely split a word.
+CUT_SEARCH_SECONDS = 2
+
+# Application close codes, after the HTTP statuses they stand for.
+CLOSE_BAD_REQUEST = 4400
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAVAILABLE = 4503
+
+
+def quietest_cut(audio):
+    search_from = max(0, len(audio) - CUT_SEARCH_SECONDS * SAMPLE_RATE)
+    energies, frame = frame_energies_db(audio[search_from:])
+    if not len(energies):
+        return len(audio)
+    return search_from + int(np.argmin(energies)) * frame + frame // 2
+
+
+class SpeakingConsumer(AsyncWebsocketConsumer):
+    """Live pronunciation feedback for one speaking exercise.
+
+    The client may send {"type": "start", "language": ..., "reference_text": ...},
+    then streams the recording as binary frames of 16 kHz mono PCM16 (little
+    endian) and finishes with {"type": "stop"}.
+
+    Every SPEAKING_STREAM_PARTIAL_SECONDS of new audio the uncommitted tail
+    is transcribed again and a "partial" message with the running score is
+    sent. Audio older than SPEAKING_STREAM_WINDOW_SECONDS is transcribed one
+    last time and committed, so each decode stays bounded. On stop the
+    recording is saved as an ExerciseAttempt and a "final" message is sent.
+
+    A stream holds a speaking admission slot from connect to disconnect;
+    when none is free the socket is closed with CLOSE_UNAVAILABLE."""
+
+    admitted = False
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if self.user.is_anonymous:
+            await self.close()
+            return
+
+        try:
+            self.exercise = await self.get_exercise(self.scope['url_route']['kwargs']['exercise_id'])
+        except ValidationError:
+            await self.close(code=CLOSE_BAD_REQUEST)
+            return
+        if self.exercise is None:
+            await self.close(code=CLOSE_NOT_FOUND)
+            return
+
+        # May wait for a slot; never on the event loop.
+        try:
+            await sync_to_async(get_admission_controller().acquire, thread_sensitive=False)(self.user.pk)
+        except AdmissionRejected:
+            await self.close(code=CLOSE_UNAVAILABLE)
+            return
+        self.admitted = True
+
+        self.service = SpeechRecognitionService()
+        self.model_size = None
+        self.language = 'fr'
+        self.reference_text = self.exercise.correct_answer
+
+        self.committed = []
+        self.pending = np.empty(0, dtype=np.float32)
+        self.decoded_samples = 0
+        self.total_samples = 0
+        self.remainder = b''
+        self.decode_task = None
+        self.finished = False
+
+        self.first_audio_at = None
+        self.first_feedback_seconds = None
+        self.partials = 0
+
+        self.storage_name = None
+        self.wav = None
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.admitted:
+            self.admitted = False
+            get_admission_controller().release(self.user.pk)
+        if getattr(self, 'finished', True):
+            return
+
+        # Closed without "stop": nothing is recorded
+        self.finished = True
+        if self.decode_task is not None:
+            self.decode_task.cancel()
+        await sync_to_async(self._discard_audio)()
+        metrics.incr('speaking.stream.abandoned')
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if self.finished:
+            return
+
+        if bytes_data is not None:
+            await self.receive_audio(bytes_data)
+            return
+
+        try:
+            data = json.loads(text_data)
+        except (TypeError, ValueError):
+            data = None
+        if not isinstance(data, dict):
+            await self.fail('Messages must be JSON objects', code=CLOSE_BAD_REQUEST)
+            return
+        message_type = data.get('type')
+
+        if message_type == 'start':
+            self.language = data.get('language', self.language)
+            self.reference_text = data.get('reference_text') or self.reference_text
+        elif message_type == 'stop':
+            await self.finish()
+
+    async def receive_audio(self, chunk):
+        if self.first_audio_at is None:
+            self.first_audio_at = time.monotonic()
+            self.model_size, _ = await database_sync_to_async(self.service.select_model)()
+            await sync_to_async(self._open_audio)()
+
+        data = self.remainder + chunk
+        usable = len(data) - len(data) % 2
+        self.remainder = data[usable:]
+
+        # File I/O stays off the event loop; frames arrive one receive() at
+        # a time, so writes keep their order.
+        await sync_to_async(self.wav.writeframes)(data[:usable])
+        samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768
+        self.pending = np.concatenate([self.pending, samples])
+        self.total_samples += len(samples)
+
+        if self.total_samples > settings.SPEAKING_STREAM_MAX_SECONDS * SAMPLE_RATE:
+            await self.finish()
+            return
+
+        if self.decode_task is None or self.decode_task.done():
+            self.decode_task = asyncio.create_task(self.update())
+
+    async def update(self):
+        window = int(settings.SPEAKING_STREAM_WINDOW_SECONDS * SAMPLE_RATE)
+        interval = int(settings.SPEAKING_STREAM_PARTIAL_SECONDS * SAMPLE_RATE)
+
+        try:
+            while not self.finished:
+                if len(self.pending) > window:
+                    cut = quietest_cut(self.pending[:window])
+                    segment, self.pending = self.pending[:cut], self.pending[cut:]
+                    self.decoded_samples = max(0, self.decoded_samples - cut)
+                    text = await self.transcribe(segment)
+                    if text:
+                        self.committed.append(text)
+                    continue
+
+                if len(self.pending) - self.decoded_samples < interval:
+                    return
+                self.decoded_samples = len(self.pending)
+                tail = await self.transcribe(self.pending)
+                if not self.finished:
+                    await self.send_partial(tail)
+        except Exception as e:
+            logger.exception('Speaking stream transcription failed')
+            await self.fail(str(e))
+
+    async def send_partial(self, tail):
+        transcription = ' '.join(self.committed + [tail]).strip()
+
+        # Score against as much of the reference as has been said so far
+        reference_words = self.reference_text.split()
+        said = min(len(reference_words), len(transcription.split()))
+        running = ' '.join(reference_words[:said])
+        scores = self.service.score_against(
+            transcription, CompiledReference(running, self.language), self.language
+        )
+
+        if self.first_feedback_seconds is None:
+            self.first_feedback_seconds = time.monotonic() - self.first_audio_at
+            metrics.observe('speaking.stream.first_feedback_seconds', self.first_feedback_seconds)
+        self.partials += 1
+
+        await self.send(text_data=json.dumps({
+            'type': 'partial',
+            'transcription': transcription,
+            'score': scores['score'],
+            'accuracy': scores['accuracy'],
+            'audio_seconds': self.total_samples / SAMPLE_RATE
+        }))
+
+    async def finish(self):
+        if self.finished:
+            return
+        if self.decode_task is not None and not self.decode_task.done():
+            await self.decode_task
+        if self.finished:
+            return
+        self.finished = True
+
+        if not self.total_samples:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'No audio received'}))
+            await self.close()
+            return
+
+        try:
+            await sync_to_async(self.wav.close)()
+            tail = await self.transcribe(self.pending) if len(self.pending) else ''
+            transcription = ' '.join(self.committed + [tail]).strip()
+
+            analysis_result = {
+                'success': True,
+                'transcription': transcription,
+                'confidence': 0.8,
+                **await database_sync_to_async(self.service.score_transcription)(
+                    transcription, self.reference_text, self.language, self.exercise.id
+                ),
+                'reference_text': self.reference_text,
+                'language': self.language,
+                'model': model_variant(self.model_size),
+                'model_tier': self.model_size,
+                'cached': False,
+                'stream': {
+                    'audio_seconds': self.total_samples / SAMPLE_RATE,
+                    'partials': self.partials,
+                    'first_feedback_seconds': self.first_feedback_seconds
+                }
+            }
+            attempt = await database_sync_to_async(record_speaking_attempt)(
+                self.user, self.exercise, self.storage_name, analysis_result
+            )
+            await database_sync_to_async(schedule_transcode)(attempt)
+        except Exception as e:
+            logger.exception('Speaking stream could not be finalized')
+            await self.fail(str(e))
+            return
+
+        metrics.incr('speaking.stream.completed')
+        await self.send(text_data=json.dumps({
+            'type': 'final',
+            'attempt_id': str(attempt.id),
+            'analysis': analysis_summary(analysis_result),
+            'first_feedback_seconds': self.first_feedback_seconds
+        }))
+        await self.close()
+
+    async def fail(self, error, code=None):
+        self.finished = True
+        await sync_to_async(self._discard_audio)()
+        metrics.incr('speaking.stream.failed')
+        await self.send(text_data=json.dumps({'type': 'error', 'error': error}))
+        await self.close(code=code)
+
+    async def transcribe(self, audio):
+        return await sync_to_async(self.service.transcribe_audio, thread_sensitive=False)(
+            audio, self.language, self.model_size
+        )
+
+    def _open_audio(self):
+        self.storage_name = default_storage.get_available_name(speaking_storage_name('stream.wav'))
+        path = default_storage.path(self.storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.wav = wave.open(path, 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(SAMPLE_RATE)
+
+    def _discard_audio(self):
+        if self.wav is not None:
+            self.wav.close()
+            default_storage.delete(self.storage_name)
+            self.wav = None
+
+    @database_sync_to_async
+    def get_exercise(self, exercise_id):
+        return Exercise.objects.filter(id=exercise_id).first()
@@ -0,0 +1,193 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from LinguaMaster.metrics import metrics
+from .admission import check_job_backlog
+from .models import ExerciseAttempt, SpeakingJob
+from .services import SpeechRecognitionService
+from .transcoding import transcode_attempt_audio
+
+
+def record_speaking_attempt(student, exercise, audio_path, analysis_result):
+    audio_size = default_storage.size(audio_path) if default_storage.exists(audio_path) else None
+    return ExerciseAttempt.objects.create(
+        student=student,
+        exercise=exercise,
+        user_answer=analysis_result['transcription'],
+        audio_url=audio_path,
+        audio_original_bytes=audio_size,
+        audio_bytes=audio_size,
+        transcription=analysis_result['transcription'],
+        confidence_score=analysis_result.get('confidence', 0),
+        pronunciation_score=analysis_result['score'],
+        feedback=json.dumps(analysis_result['feedback']),
+        whisper_analysis=json.dumps(analysis_result),
+        is_correct=analysis_result['score'] >= 70,
+        score=int(analysis_result['score'])
+    )
+
+
+def schedule_transcode(attempt):
+    # Off the request path: the user already has their result.
+    if settings.SPEAKING_AUDIO_TRANSCODE:
+        transaction.on_commit(lambda: get_local_runner().submit_transcode(attempt.id))
+
+
+def analysis_summary(analysis_result):
+    return {
+        'transcription': analysis_result['transcription'],
+        'confidence': analysis_result.get('confidence', 0),
+        'accuracy': analysis_result['accuracy'],
+        'score': analysis_result['score'],
+        'feedback': analysis_result['feedback']
+    }
+
+
+def enqueue_speaking_job(student, exercise, audio_path, reference_text, language, audio_digest=''):
+    """Raises AdmissionRejected if the user's backlog filled up meanwhile."""
+    with transaction.atomic():
+        # Concurrent uploads of one user serialize on the user's row, so
+        # they cannot all pass the per-user backlog check.
+        get_user_model().objects.select_for_update().only('pk').get(pk=student.pk)
+        check_job_backlog(student)
+        job = SpeakingJob.objects.create(
+            student=student,
+            exercise=exercise,
+            audio_path=audio_path,
+            audio_digest=audio_digest or '',
+            reference_text=reference_text or '',
+            language=language
+        )
+    metrics.incr('speaking.jobs.queued')
+
+    if settings.SPEAKING_QUEUE_BACKEND == 'local':
+        transaction.on_commit(lambda: get_local_runner().submit(job.id))
+
+    return job
+
+
+def claim_job(job_id=None):
+    # The row lock plus the status guard makes a claim safe with any number
+    # of workers on Postgres; SQLite ignores FOR UPDATE but keeps the guard.
+    with transaction.atomic():
+        queryset = SpeakingJob.objects.select_for_update(skip_locked=True).filter(status='queued')
+        if job_id is not None:
+            queryset = queryset.filter(id=job_id)
+        job = queryset.order_by('created_at').first()
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.tries += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'tries', 'started_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - timedelta(seconds=settings.SPEAKING_JOB_TIMEOUT)
+    stale = SpeakingJob.objects.filter(status='running', started_at__lt=cutoff)
+
+    failed = stale.filter(tries__gte=settings.SPEAKING_JOB_MAX_TRIES).update(
+        status='failed',
+        error='Job timed out',
+        finished_at=timezone.now()
+    )
+    requeued = stale.filter(tries__lt=settings.SPEAKING_JOB_MAX_TRIES).update(status='queued')
+    return requeued, failed
+
+
+def run_speaking_job(job, service=None):
+    try:
+        # Inside the try: a backend that fails to load fails the job, it
+        # must not leave it 'running' until the stale check.
+        service = service or SpeechRecognitionService()
+        exercise = job.exercise
+        analysis_result = service.analyze_pronunciation(
+            default_storage.path(job.audio_path),
+            job.reference_text or exercise.correct_answer,
+            job.language,
+            audio_digest=job.audio_digest or None,
+            exercise_id=exercise.id
+        )
+        if not analysis_result['success']:
+            raise RuntimeError(analysis_result.get('error') or 'Analysis failed')
+
+        attempt = record_speaking_attempt(job.student, exercise, job.audio_path, analysis_result)
+    except Exception as e:
+        default_storage.delete(job.audio_path)
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        metrics.incr('speaking.jobs.failed')
+        return job
+
+    job.status = 'done'
+    job.attempt = attempt
+    job.result = {
+        'attempt_id': str(attempt.id),
+        'analysis': analysis_summary(analysis_result)
+    }
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'attempt', 'result', 'finished_at'])
+
+    metrics.incr('speaking.jobs.done')
+    metrics.observe('speaking.jobs.latency_seconds',
+                    (job.finished_at - job.created_at).total_seconds())
+
+    # Already off the request path here, and after the result is visible
+    if settings.SPEAKING_AUDIO_TRANSCODE:
+        transcode_attempt_audio(attempt.id)
+    return job
+
+
+class LocalJobRunner:
+    """In-process stand-in for the worker pool, used when no separate
+    run_speaking_workers processes are deployed."""
+
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='speaking-job')
+
+    def submit(self, job_id):
+        return self.executor.submit(self._run, job_id)
+
+    def submit_transcode(self, attempt_id):
+        return self.executor.submit(self._transcode, attempt_id)
+
+    def _transcode(self, attempt_id):
+        try:
+            transcode_attempt_audio(attempt_id)
+        finally:
+            connections.close_all()
+
+    def _run(self, job_id):
+        try:
+            job = claim_job(job_id)
+            if job is not None:
+                run_speaking_job(job)
+        finally:
+            # Connections are per thread; don't leak one per executor thread.
+            connections.close_all()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_local_runner():
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = LocalJobRunner(settings.SPEAKING_LOCAL_WORKERS)
+    return _runner
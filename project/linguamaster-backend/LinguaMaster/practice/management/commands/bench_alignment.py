@@ -0,0 +1,77 @@
+import random
+import time
+from difflib import SequenceMatcher
+
+from django.core.management.base import BaseCommand
+
+from LinguaMaster.text import char_similarity, char_similarity_batch
+from practice.alignment import align_words, align_words_batch
+
+VOCABULARY = (
+    "le la les un une des je tu il elle nous vous ils bonjour merci au revoir "
+    "maison chat chien pain fromage école ville voiture manger parler aller "
+    "venir avoir être très bien toujours jamais aujourd'hui demain hier"
+).split()
+
+
+def legacy_accuracy(user_text, reference_text):
+    # The scoring previously in SpeechRecognitionService._calculate_accuracy.
+    similarity = SequenceMatcher(None, user_text.lower(), reference_text.lower()).ratio()
+    user_words = user_text.lower().split()
+    reference_words = reference_text.lower().split()
+    correct_words = sum(1 for uw, rw in zip(user_words, reference_words) if uw == rw)
+    return similarity, correct_words
+
+
+def make_pairs(rng, count, words, error_rate):
+    pairs = []
+    for _ in range(count):
+        reference = rng.choices(VOCABULARY, k=words)
+        hypothesis = []
+        for word in reference:
+            roll = rng.random()
+            if roll < error_rate / 3:
+                continue
+            if roll < 2 * error_rate / 3:
+                hypothesis.append(rng.choice(VOCABULARY))
+            elif roll < error_rate:
+                hypothesis.extend([word, rng.choice(VOCABULARY)])
+            else:
+                hypothesis.append(word)
+        pairs.append((' '.join(reference), ' '.join(hypothesis)))
+    return pairs
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark the alignment scorer against the old SequenceMatcher scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=200)
+        parser.add_argument('--lengths', type=int, nargs='+', default=[8, 32, 128, 512],
+                            help='Reference passage lengths in words')
+        parser.add_argument('--error-rate', type=float, default=0.15)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(
+            f"{'words':>6} {'legacy ms':>10} {'single ms':>10} {'batch ms':>9}   (per pair, {options['pairs']} pairs)"
+        )
+
+        for words in options['lengths']:
+            pairs = make_pairs(rng, options['pairs'], words, options['error_rate'])
+
+            legacy = timed(lambda: [legacy_accuracy(hyp, ref) for ref, hyp in pairs])
+            single = timed(lambda: [(align_words(ref, hyp), char_similarity(ref, hyp)) for ref, hyp in pairs])
+            batch = timed(lambda: (align_words_batch(pairs), char_similarity_batch(pairs)))
+
+            per_pair = 1000 / len(pairs)
+            self.stdout.write(
+                f'{words:>6} {legacy * per_pair:10.3f} {single * per_pair:10.3f} {batch * per_pair:9.3f}'
+            )
@@ -0,0 +1,104 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from practice.batching import MicroBatcher
+from practice.model_pool import ModelPool
+from practice.speech_backends import SAMPLE_RATE, get_speech_backend
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.mp3', '.ogg', '.m4a', '.flac')
+
+
+def load_clips(backend, directory, synthetic, seconds):
+    if directory:
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+        if not paths:
+            raise CommandError(f'No audio clips found in {directory}')
+        return [backend.load_audio(path) for path in paths]
+
+    # Low-level noise is enough to exercise the encoder/decoder shapes when no
+    # recorded corpus is at hand; transcripts are meaningless but timings hold.
+    rng = np.random.default_rng(0)
+    return [(rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.01).astype(np.float32)
+            for _ in range(synthetic)]
+
+
+def summarize(label, latencies, elapsed, clips, cores):
+    latencies = sorted(latencies)
+    return (
+        f'{label:<22} {clips / elapsed:8.2f} clips/s  '
+        f'{clips / elapsed / cores:8.3f} clips/s/core  '
+        f'p50 {latencies[len(latencies) // 2] * 1000:8.1f} ms  '
+        f'p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:8.1f} ms'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare batched and unbatched Whisper throughput on a clip corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clips', help='Directory of short audio clips')
+        parser.add_argument('--synthetic', type=int, default=32,
+                            help='Number of generated clips when --clips is not given')
+        parser.add_argument('--seconds', type=float, default=4.0)
+        parser.add_argument('--model', default=settings.WHISPER_MODEL_SIZE)
+        parser.add_argument('--language', default='fr')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Simultaneous submitters in the batched run')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 8])
+        parser.add_argument('--max-wait-ms', type=int, default=settings.WHISPER_BATCH_MAX_WAIT_MS)
+
+    def handle(self, *args, **options):
+        import torch
+
+        backend = get_speech_backend()
+        clips = load_clips(backend, options['clips'], options['synthetic'], options['seconds'])
+        language = options['language']
+        pool = ModelPool(backend.load_model)
+        model = pool.get_model(options['model'])
+
+        cores = torch.get_num_threads()
+        self.stdout.write(f"{len(clips)} clips, model={options['model']}, torch threads={cores}")
+
+        # Warm up kernels so the first measured run doesn't pay for it.
+        backend.decode_batch(model, clips[:1], language)
+
+        latencies = []
+        started = time.perf_counter()
+        for clip in clips:
+            clip_started = time.perf_counter()
+            backend.transcribe(model, clip, language)
+            latencies.append(time.perf_counter() - clip_started)
+        self.stdout.write(summarize('transcribe (unbatched)', latencies,
+                                    time.perf_counter() - started, len(clips), cores))
+
+        latencies = []
+        started = time.perf_counter()
+        for clip in clips:
+            clip_started = time.perf_counter()
+            backend.decode_batch(model, [clip], language)
+            latencies.append(time.perf_counter() - clip_started)
+        self.stdout.write(summarize('decode batch=1', latencies,
+                                    time.perf_counter() - started, len(clips), cores))
+
+        for batch_size in options['batch_sizes']:
+            batcher = MicroBatcher(pool, options['model'], max_batch_size=batch_size,
+                                   max_wait_ms=options['max_wait_ms'], backend=backend)
+
+            def submit(clip):
+                clip_started = time.perf_counter()
+                batcher.transcribe(clip, language)
+                return time.perf_counter() - clip_started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                latencies = list(executor.map(submit, clips))
+            self.stdout.write(summarize(f'micro-batch max={batch_size}', latencies,
+                                        time.perf_counter() - started, len(clips), cores))
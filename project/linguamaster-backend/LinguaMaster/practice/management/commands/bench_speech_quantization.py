@@ -0,0 +1,96 @@
+import json
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from practice.services import SpeechRecognitionService
+from practice.speech_backends import PRECISIONS, get_speech_backend
+
+
+def load_corpus(backend, directory):
+    # A corpus is a directory of clips plus references.json mapping each
+    # clip's file name to the text the student was asked to read.
+    references_path = os.path.join(directory, 'references.json')
+    if not os.path.exists(references_path):
+        raise CommandError(f'{references_path} not found')
+
+    with open(references_path) as f:
+        references = json.load(f)
+    return [
+        (name, backend.load_audio(os.path.join(directory, name)), reference)
+        for name, reference in sorted(references.items())
+    ]
+
+
+def model_megabytes(model):
+    import torch
+
+    state = model.state_dict()
+    total = 0
+    for value in state.values():
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            # Packed dynamic-quantized Linear params: (weight, bias)
+            total += sum(t.numel() * t.element_size() for t in value
+                         if isinstance(t, torch.Tensor))
+    return total / 1024 / 1024
+
+
+class Command(BaseCommand):
+    help = 'Compare pronunciation scores and latency of fp32 vs int8 Whisper models on a local clip corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help='Directory with audio clips and references.json')
+        parser.add_argument('--sizes', nargs='+', default=['tiny', 'base'])
+        parser.add_argument('--precisions', nargs='+', choices=PRECISIONS, default=list(PRECISIONS))
+        parser.add_argument('--language', default='fr')
+        parser.add_argument('--baseline', default=None,
+                            help='Reference configuration, e.g. base:fp32 (defaults to the largest fp32 size)')
+
+    def handle(self, *args, **options):
+        backend = get_speech_backend()
+        corpus = load_corpus(backend, options['corpus'])
+        scorer = SpeechRecognitionService(backend=backend)
+        language = options['language']
+
+        results = {}
+        for size in options['sizes']:
+            for precision in options['precisions']:
+                model = backend.load_model(size, precision=precision)
+                backend.transcribe(model, corpus[0][1], language)  # warm-up
+
+                latencies, scores = [], {}
+                for name, audio, reference in corpus:
+                    started = time.perf_counter()
+                    text = backend.transcribe(model, audio, language)['text'].strip()
+                    latencies.append(time.perf_counter() - started)
+                    scores[name] = scorer.score_transcription(text, reference, language)['score']
+
+                results[f'{size}:{precision}'] = {
+                    'latencies': sorted(latencies),
+                    'scores': scores,
+                    'megabytes': model_megabytes(model),
+                }
+                del model
+
+        baseline = options['baseline'] or f"{options['sizes'][-1]}:fp32"
+        if baseline not in results:
+            raise CommandError(f'Baseline {baseline} was not measured')
+        baseline_scores = results[baseline]['scores']
+
+        self.stdout.write(f'{len(corpus)} clips, baseline {baseline}')
+        self.stdout.write(f"{'config':<14} {'weights MB':>10} {'mean ms':>9} {'p95 ms':>9} "
+                          f"{'mean score':>10} {'mean |Δ|':>9} {'max |Δ|':>8}")
+        for config, result in results.items():
+            latencies = result['latencies']
+            drift = [abs(score - baseline_scores[name]) for name, score in result['scores'].items()]
+            self.stdout.write(
+                f'{config:<14} {result["megabytes"]:10.1f} '
+                f'{statistics.mean(latencies) * 1000:9.1f} '
+                f'{latencies[int(0.95 * (len(latencies) - 1))] * 1000:9.1f} '
+                f'{statistics.mean(result["scores"].values()):10.2f} '
+                f'{statistics.mean(drift):9.2f} {max(drift):8.2f}'
+            )
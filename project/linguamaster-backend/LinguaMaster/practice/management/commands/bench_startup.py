@@ -0,0 +1,80 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Each entry point also resolves the URLconf, which is what imports every
+# app's views (and, before the speech backend was made lazy, whisper/torch).
+ENTRY_POINTS = {
+    'wsgi': (
+        'import LinguaMaster.wsgi\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns\n'
+    ),
+    'asgi': (
+        'import LinguaMaster.asgi\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns\n'
+    ),
+    'manage.py': (
+        'import runpy, sys\n'
+        "sys.argv = ['manage.py', 'check']\n"
+        "runpy.run_path('manage.py', run_name='__main__')\n"
+    ),
+}
+
+MODES = {
+    'lazy': '',
+    # Reproduces the old module-level `import whisper` in practice.services.
+    'eager': 'import whisper\n',
+}
+
+
+def run_once(code):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'LinguaMaster.settings')),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is reported in kilobytes on Linux.
+    return elapsed, usage.ru_maxrss / 1024, process.returncode
+
+
+class Command(BaseCommand):
+    help = 'Measure process startup time and peak RSS per entry point, lazy vs eager speech imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--entry-points', nargs='+', choices=list(ENTRY_POINTS),
+                            default=list(ENTRY_POINTS))
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'entry point':<12} {'mode':<6} {'median s':>9} {'min s':>7} {'peak RSS MB':>12}")
+
+        for entry_point in options['entry_points']:
+            for mode in options['modes']:
+                code = MODES[mode] + ENTRY_POINTS[entry_point]
+                runs = [run_once(code) for _ in range(options['repeat'])]
+
+                failed = [run for run in runs if run[2] != 0]
+                if failed:
+                    self.stdout.write(f'{entry_point:<12} {mode:<6} failed (exit {failed[0][2]})')
+                    continue
+
+                times = [run[0] for run in runs]
+                self.stdout.write(
+                    f'{entry_point:<12} {mode:<6} {statistics.median(times):9.3f} '
+                    f'{min(times):7.3f} {max(run[1] for run in runs):12.1f}'
+                )
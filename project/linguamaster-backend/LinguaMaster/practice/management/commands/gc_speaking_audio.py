@@ -0,0 +1,206 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from practice.models import ExerciseAttempt, SpeakingJob
+from practice.uploads import SPEAKING_AUDIO_DIR, sharded_name
+
+# Audio that has been downsampled already; never touched again.
+DOWNSAMPLED_SUFFIX = '.lq.ogg'
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Reconcile speaking audio in storage with ExerciseAttempt.audio_url (orphans, missing files, '
+            'flat layout) and apply the downsample/retention policy')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report only, change nothing')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--grace-hours', type=float, default=settings.SPEAKING_AUDIO_GC_GRACE_HOURS,
+                            help='Never delete unreferenced files younger than this')
+        parser.add_argument('--skip-orphans', action='store_true')
+        parser.add_argument('--skip-retention', action='store_true')
+        parser.add_argument('--reshard', action='store_true',
+                            help='Move referenced files from the old flat layout into shards')
+        parser.add_argument('--clear-missing', action='store_true',
+                            help='Null audio_url on attempts whose file no longer exists')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.dry_run = options['dry_run']
+        self.stats = dict.fromkeys([
+            'scanned', 'recent', 'orphans', 'orphan_bytes', 'resharded', 'missing',
+            'downsampled', 'downsample_bytes_saved', 'expired', 'expired_bytes',
+        ], 0)
+
+        started = time.monotonic()
+        if not options['skip_orphans']:
+            self.collect_orphans()
+            self.find_missing()
+        if not options['skip_retention']:
+            if settings.SPEAKING_AUDIO_DOWNSAMPLE_DAYS:
+                self.downsample()
+            if settings.SPEAKING_AUDIO_RETENTION_DAYS:
+                self.expire()
+
+        self.stdout.write(self.style.SUCCESS(
+            ('[dry run] ' if self.dry_run else '')
+            + ', '.join(f'{key}={value}' for key, value in self.stats.items())
+            + f' in {time.monotonic() - started:.1f}s'
+        ))
+
+    def _files(self):
+        # os.walk goes one directory at a time; with the sharded layout each
+        # listing stays small.
+        root = default_storage.path(SPEAKING_AUDIO_DIR)
+        media_root = default_storage.path('')
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, media_root).replace(os.sep, '/'), path
+
+    def _referenced(self, names):
+        referenced = set(
+            ExerciseAttempt.objects.filter(audio_url__in=names).values_list('audio_url', flat=True)
+        )
+        referenced.update(
+            SpeakingJob.objects.filter(audio_path__in=names, status__in=('queued', 'running'))
+            .values_list('audio_path', flat=True)
+        )
+        return referenced
+
+    def collect_orphans(self):
+        cutoff = time.time() - self.options['grace_hours'] * 3600
+
+        for batch in batched(self._files(), self.options['batch_size']):
+            referenced = self._referenced([name for name, _ in batch])
+            for name, path in batch:
+                self.stats['scanned'] += 1
+                if name in referenced:
+                    if self.options['reshard'] and name.count('/') == 1:
+                        self.reshard(name, path)
+                    continue
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                # Uploads and live streams are referenced only once they
+                # complete; leave young files alone.
+                if stat.st_mtime > cutoff:
+                    self.stats['recent'] += 1
+                    continue
+
+                self.stats['orphans'] += 1
+                self.stats['orphan_bytes'] += stat.st_size
+                if not self.dry_run:
+                    default_storage.delete(name)
+
+    def reshard(self, name, path):
+        file_name = name.rsplit('/', 1)[1]
+        new_name = sharded_name(hashlib.sha1(file_name.encode()).hexdigest(), file_name)
+        self.stats['resharded'] += 1
+        if self.dry_run:
+            return
+
+        # Link, repoint, unlink: a crash at any step leaves at worst an
+        # unreferenced copy for the next run to collect.
+        new_path = default_storage.path(new_name)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        if not os.path.exists(new_path):
+            os.link(path, new_path)
+        ExerciseAttempt.objects.filter(audio_url=name).update(audio_url=new_name)
+        SpeakingJob.objects.filter(audio_path=name).update(audio_path=new_name)
+        os.remove(path)
+
+    def find_missing(self):
+        attempts = (
+            ExerciseAttempt.objects.filter(audio_url__startswith=f'{SPEAKING_AUDIO_DIR}/')
+            .values_list('id', 'audio_url').iterator(chunk_size=self.options['batch_size'])
+        )
+        for batch in batched(attempts, self.options['batch_size']):
+            missing = [attempt_id for attempt_id, name in batch if not default_storage.exists(name)]
+            self.stats['missing'] += len(missing)
+            if missing and self.options['clear_missing'] and not self.dry_run:
+                ExerciseAttempt.objects.filter(id__in=missing).update(audio_url=None)
+
+    def _aged(self, days, until_days=None):
+        now = timezone.now()
+        attempts = ExerciseAttempt.objects.filter(
+            attempted_at__lt=now - timedelta(days=days),
+            audio_url__startswith=f'{SPEAKING_AUDIO_DIR}/'
+        )
+        if until_days:
+            attempts = attempts.filter(attempted_at__gte=now - timedelta(days=until_days))
+        return attempts.values_list('id', 'audio_url').iterator(chunk_size=self.options['batch_size'])
+
+    def downsample(self):
+        if shutil.which('ffmpeg') is None:
+            self.stderr.write('ffmpeg not found, skipping downsampling')
+            return
+
+        # Audio about to expire is not worth re-encoding.
+        for attempt_id, name in self._aged(settings.SPEAKING_AUDIO_DOWNSAMPLE_DAYS,
+                                           settings.SPEAKING_AUDIO_RETENTION_DAYS):
+            if name.endswith(DOWNSAMPLED_SUFFIX) or not default_storage.exists(name):
+                continue
+            new_name = os.path.splitext(name)[0] + DOWNSAMPLED_SUFFIX
+            if self.dry_run:
+                self.stats['downsampled'] += 1
+                continue
+
+            # Mono 8 kHz Opus is plenty for a human listening back to a
+            # recording that has long been scored.
+            result = subprocess.run([
+                'ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', default_storage.path(name),
+                '-ac', '1', '-ar', '8000', '-c:a', 'libopus', '-b:a', '12k', default_storage.path(new_name)
+            ], capture_output=True)
+            if result.returncode != 0:
+                self.stderr.write(f'Could not downsample {name}: {result.stderr.decode(errors="replace")}')
+                default_storage.delete(new_name)
+                continue
+
+            old_size = default_storage.size(name)
+            new_size = default_storage.size(new_name)
+            # Only repoint if nothing else changed the attempt meanwhile.
+            if ExerciseAttempt.objects.filter(id=attempt_id, audio_url=name).update(
+                    audio_url=new_name, audio_bytes=new_size):
+                self.stats['downsampled'] += 1
+                self.stats['downsample_bytes_saved'] += old_size - new_size
+                default_storage.delete(name)
+            else:
+                default_storage.delete(new_name)
+
+    def expire(self):
+        for batch in batched(self._aged(settings.SPEAKING_AUDIO_RETENTION_DAYS), self.options['batch_size']):
+            self.stats['expired'] += len(batch)
+            for _, name in batch:
+                if default_storage.exists(name):
+                    self.stats['expired_bytes'] += default_storage.size(name)
+            if self.dry_run:
+                continue
+
+            # References go first; a crash in between leaves orphans, which
+            # the next run collects.
+            ExerciseAttempt.objects.filter(id__in=[attempt_id for attempt_id, _ in batch]).update(audio_url=None)
+            for _, name in batch:
+                default_storage.delete(name)
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = {
+    # No model at all: the interpreter, Django and torch, for reference.
+    'none': 'spawn',
+    # Every worker loads its own private copy (the old behaviour).
+    'copy': 'spawn',
+    # Every worker maps the same fp32 checkpoint file.
+    'mmap': 'spawn',
+    # The parent loads once and forks; workers share the pages copy-on-write.
+    'prefork': 'fork',
+}
+
+
+def read_memory(pid):
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            field, value = line.split()[:2]
+            if field in ('Rss:', 'Pss:'):
+                memory[field[:-1].lower()] = int(value) / 1024
+    return memory
+
+
+def load_model(size, mmap):
+    import torch
+    import whisper
+    from practice.speech_backends import WhisperBackend
+
+    torch.set_num_threads(1)
+    if mmap:
+        return WhisperBackend()._load_mmap(size)
+    return whisper.load_model(size, device='cpu')
+
+
+def touch(model):
+    # Read every weight so its pages are resident, as they are once a worker
+    # has served a request.
+    import torch
+
+    with torch.no_grad():
+        return sum(float(parameter.sum()) for parameter in model.parameters())
+
+
+def worker(mode, size, ready, release, model=None):
+    if mode != 'prefork':
+        import django
+        import whisper  # noqa: F401 -- every worker pays for torch itself
+        django.setup()
+        if mode != 'none':
+            model = load_model(size, mode == 'mmap')
+    if model is not None:
+        touch(model)
+    ready.put(os.getpid())
+    release.wait()
+
+
+class Command(BaseCommand):
+    help = 'Measure per-worker RSS and PSS of the Whisper weights for private, mmap and pre-fork loading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=settings.WHISPER_MODEL_SIZE,
+                            help='Model size or path of a Whisper checkpoint')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('PSS needs /proc/<pid>/smaps_rollup (Linux 4.14+)')
+
+        size = options['model']
+        if 'mmap' in options['modes']:
+            # Convert once up front rather than in every worker.
+            from practice.speech_backends import mmap_checkpoint
+            if mmap_checkpoint(size) is None:
+                raise CommandError(f'No checkpoint found for {size!r}; mmap loading is unavailable')
+
+        self.stdout.write(f"model={size}")
+        self.stdout.write(
+            f"{'mode':<8} {'workers':>7} {'RSS/worker MB':>14} {'PSS/worker MB':>14} {'total PSS MB':>13}"
+        )
+        for mode in options['modes']:
+            for count in options['workers']:
+                self.measure(mode, size, count)
+
+    def measure(self, mode, size, count):
+        context = multiprocessing.get_context(MODES[mode])
+        model = load_model(size, mmap=False) if mode == 'prefork' else None
+
+        ready = context.Queue()
+        release = context.Event()
+        processes = [
+            context.Process(target=worker, args=(mode, size, ready, release, model))
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            pids = [ready.get(timeout=600) for _ in processes]
+            samples = [read_memory(pid) for pid in pids]
+            # The pre-forked parent keeps its copy alive for the workers.
+            parent_pss = read_memory(os.getpid())['pss'] if model is not None else 0
+        finally:
+            release.set()
+            for process in processes:
+                process.join()
+
+        rss = sum(sample['rss'] for sample in samples) / count
+        pss = sum(sample['pss'] for sample in samples) / count
+        self.stdout.write(
+            f'{mode:<8} {count:>7} {rss:14.1f} {pss:14.1f} {pss * count + parent_pss:13.1f}'
+        )
@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from practice.models import ExerciseAttempt
+from practice.rescoring import init_worker, load_analysis, rescore_rows
+
+UPDATE_FIELDS = ['pronunciation_score', 'score', 'is_correct', 'feedback', 'whisper_analysis']
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = 'Re-score speaking ExerciseAttempts from their stored transcriptions (no Whisper)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Attempts per scoring task and per bulk_update')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per round trip from the server-side cursor')
+        parser.add_argument('--checkpoint', default='rescore_attempts.checkpoint.json',
+                            help='Resume from / record progress in this file')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        checkpoint_path = None if options['dry_run'] else options['checkpoint']
+        checkpoint = None if options['restart'] else read_checkpoint(checkpoint_path)
+
+        attempts = ExerciseAttempt.objects.filter(whisper_analysis__isnull=False).exclude(transcription='')
+        if checkpoint:
+            attempted_at = parse_datetime(checkpoint['attempted_at'])
+            if attempted_at is None:
+                raise CommandError(f'Unreadable checkpoint in {checkpoint_path}')
+            attempts = attempts.filter(
+                Q(attempted_at__gt=attempted_at) | Q(attempted_at=attempted_at, id__gt=checkpoint['id'])
+            )
+            self.stdout.write(f"Resuming after {checkpoint['processed']} attempts ({checkpoint['id']})")
+
+        rows = attempts.order_by('attempted_at', 'id').values_list(
+            'id', 'attempted_at', 'transcription', 'whisper_analysis',
+            'exercise__correct_answer', 'exercise__lesson__module__course__language__code'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        self.state = {
+            'processed': checkpoint['processed'] if checkpoint else 0,
+            'updated': checkpoint['updated'] if checkpoint else 0,
+        }
+        self.started = self.last_report = time.monotonic()
+        self.run_count = 0
+
+        # Results are written back in submission order so the checkpoint only
+        # ever moves past attempts that are saved.
+        pending = deque()
+        with ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker) as pool:
+            for batch in self._batches(rows, options['batch_size']):
+                scoring_rows = [(row['id'], row['transcription'], row['reference_text'], row['language'])
+                                for row in batch]
+                pending.append((batch, pool.submit(rescore_rows, scoring_rows)))
+                if len(pending) >= 2 * options['workers']:
+                    self._flush(*pending.popleft(), options, checkpoint_path)
+            while pending:
+                self._flush(*pending.popleft(), options, checkpoint_path)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-scored {self.run_count} attempts in {elapsed:.1f}s "
+            f"({self.run_count / elapsed if elapsed else 0:.0f} attempts/s), "
+            f"{self.state['updated']} changed in total"
+            + (' (dry run, nothing written)' if options['dry_run'] else '')
+        ))
+
+    def _batches(self, rows, batch_size):
+        batch = []
+        for attempt_id, attempted_at, transcription, raw_analysis, correct_answer, language in rows:
+            analysis, as_text = load_analysis(raw_analysis)
+            batch.append({
+                'id': attempt_id,
+                'attempted_at': attempted_at,
+                'transcription': transcription,
+                'analysis': analysis,
+                'as_text': as_text,
+                # Attempts recorded before the reference was kept in the
+                # analysis were scored against the exercise answer.
+                'reference_text': analysis.get('reference_text') or correct_answer,
+                'language': analysis.get('language') or language or 'fr',
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _flush(self, batch, future, options, checkpoint_path):
+        results = dict(future.result())
+
+        changed = []
+        for row in batch:
+            result = results[row['id']]
+            old_score = row['analysis'].get('score')
+            if old_score is not None and round(old_score, 2) == round(result['score'], 2):
+                continue
+
+            analysis = dict(row['analysis'], **result)
+            changed.append(ExerciseAttempt(
+                id=row['id'],
+                pronunciation_score=Decimal(f"{result['score']:.2f}"),
+                score=int(result['score']),
+                is_correct=result['score'] >= 70,
+                feedback=json.dumps(result['feedback']),
+                whisper_analysis=json.dumps(analysis) if row['as_text'] else analysis
+            ))
+
+        if changed and not options['dry_run']:
+            ExerciseAttempt.objects.bulk_update(changed, UPDATE_FIELDS)
+
+        self.run_count += len(batch)
+        self.state['processed'] += len(batch)
+        self.state['updated'] += len(changed)
+        if checkpoint_path:
+            last = batch[-1]
+            write_checkpoint(checkpoint_path, dict(
+                self.state, attempted_at=last['attempted_at'].isoformat(), id=str(last['id'])
+            ))
+
+        now = time.monotonic()
+        if now - self.last_report >= 5:
+            self.last_report = now
+            self.stdout.write(
+                f"{self.state['processed']} processed, {self.state['updated']} changed, "
+                f"{self.run_count / (now - self.started):.0f} attempts/s"
+            )
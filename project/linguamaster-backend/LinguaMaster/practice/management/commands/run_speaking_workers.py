@@ -0,0 +1,92 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from practice.jobs import claim_job, requeue_stale_jobs, run_speaking_job
+
+logger = logging.getLogger(__name__)
+
+
+def worker_loop(poll_interval, stale_check_interval, threads=1):
+    # Never reuse a connection inherited from the parent process.
+    connections.close_all()
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+
+    # Several claiming threads per process keep the micro-batcher fed; the
+    # model itself is still shared through the process-wide pool.
+    runners = [
+        threading.Thread(target=run_jobs, args=(stopping, poll_interval, stale_check_interval))
+        for _ in range(threads)
+    ]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join()
+
+
+def run_jobs(stopping, poll_interval, stale_check_interval):
+    last_stale_check = 0
+    while not stopping:
+        try:
+            if time.monotonic() - last_stale_check > stale_check_interval:
+                requeue_stale_jobs()
+                last_stale_check = time.monotonic()
+
+            job = claim_job()
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            run_speaking_job(job)
+        except Exception:
+            logger.exception('Speaking worker error')
+            connections.close_all()
+            time.sleep(poll_interval)
+
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run worker processes that execute queued speaking-analysis jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Jobs run concurrently per process (use with WHISPER_BATCHING)')
+        parser.add_argument('--poll-interval', type=float, default=0.5)
+        parser.add_argument('--stale-check-interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        connections.close_all()
+
+        workers = []
+        for _ in range(options['processes']):
+            process = multiprocessing.Process(
+                target=worker_loop,
+                args=(options['poll_interval'], options['stale_check_interval'],
+                      options['threads']),
+                daemon=True
+            )
+            process.start()
+            workers.append(process)
+
+        self.stdout.write(f"Started {len(workers)} speaking workers: "
+                          f"{', '.join(str(w.pid) for w in workers)}")
+
+        def stop(*args):
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        for process in workers:
+            process.join()
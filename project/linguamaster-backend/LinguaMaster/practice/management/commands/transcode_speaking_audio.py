@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from practice.models import ExerciseAttempt
+from practice.transcoding import transcode_attempt_audio
+from practice.uploads import SPEAKING_AUDIO_DIR
+
+
+class Command(BaseCommand):
+    help = 'Re-encode stored speaking audio of existing attempts as mono Opus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Stop after this many attempts')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        attempts = (
+            ExerciseAttempt.objects.filter(audio_url__startswith=f'{SPEAKING_AUDIO_DIR}/')
+            .exclude(audio_url__endswith='.ogg')
+            .order_by('attempted_at', 'id')
+            .values_list('id', flat=True)
+        )
+        if options['limit']:
+            attempts = attempts[:options['limit']]
+
+        started = time.monotonic()
+        scanned = transcoded = before = after = 0
+        for attempt_id in attempts.iterator(chunk_size=options['chunk_size']):
+            scanned += 1
+            sizes = transcode_attempt_audio(attempt_id)
+            if sizes:
+                transcoded += 1
+                before += sizes[0]
+                after += sizes[1]
+
+        ratio = f', {after / before:.1%} of the original size' if before else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Transcoded {transcoded} of {scanned} attempts in {time.monotonic() - started:.1f}s: '
+            f'{before} -> {after} bytes{ratio}'
+        ))
@@ -0,0 +1,36 @@
+from django.db.models import Q
+
+from courses.models import Course, MediaReference
+from .models import ExerciseAttempt, SpeakingJob
+from .uploads import SPEAKING_AUDIO_DIR
+
+
+def can_read_media(user, name):
+    """Speaking audio is readable by its student only. Course thumbnails are
+    public; lesson and exercise media are public for free courses and
+    otherwise readable by the course's students and author. Course media is
+    found through MediaReference, one indexed lookup per request."""
+    if user.is_staff:
+        return True
+
+    if name.startswith(f'{SPEAKING_AUDIO_DIR}/'):
+        return user.is_authenticated and (
+            ExerciseAttempt.objects.filter(audio_url=name, student=user).exists()
+            or SpeakingJob.objects.filter(audio_path=name, student=user).exists()
+        )
+
+    references = MediaReference.objects.filter(name=name).values_list(
+        'course__is_active', 'lesson__module__course_id', 'exercise__lesson__module__course_id'
+    )
+    course_ids = set()
+    for thumbnail_of_active_course, lesson_course_id, exercise_course_id in references:
+        if thumbnail_of_active_course:
+            return True
+        course_ids.update({lesson_course_id, exercise_course_id} - {None})
+    if not course_ids:
+        return False
+
+    readers = Q(is_free=True)
+    if user.is_authenticated:
+        readers |= Q(created_by=user) | Q(enrollments__student=user, enrollments__enrollment_status='active')
+    return Course.objects.filter(readers, id__in=course_ids).exists()
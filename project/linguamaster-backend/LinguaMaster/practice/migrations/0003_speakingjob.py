@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+        ('practice', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeakingJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('audio_path', models.CharField(max_length=500)),
+                ('reference_text', models.TextField(blank=True)),
+                ('language', models.CharField(default='fr', max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('tries', models.IntegerField(default=0)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('attempt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='speaking_jobs', to='practice.exerciseattempt')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='speaking_jobs', to='courses.exercise')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='speaking_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'speaking_jobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='speaking_job_queue_idx')],
+            },
+        ),
+    ]
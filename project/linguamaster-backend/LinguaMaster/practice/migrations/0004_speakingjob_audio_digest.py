@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0003_speakingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='speakingjob',
+            name='audio_digest',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
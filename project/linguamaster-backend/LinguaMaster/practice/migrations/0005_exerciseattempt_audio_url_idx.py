@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+        ('practice', '0004_speakingjob_audio_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exerciseattempt',
+            index=models.Index(fields=['audio_url'], name='attempt_audio_url_idx'),
+        ),
+    ]
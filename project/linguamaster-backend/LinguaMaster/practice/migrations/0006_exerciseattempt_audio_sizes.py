@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0005_exerciseattempt_audio_url_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exerciseattempt',
+            name='audio_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='exerciseattempt',
+            name='audio_original_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
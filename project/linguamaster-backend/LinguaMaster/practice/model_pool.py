@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from LinguaMaster.metrics import metrics
+from .speech_backends import get_speech_backend, model_precision
+
+
+class ModelPoolTimeout(Exception):
+    pass
+
+
+class ModelPool:
+    """Loads each model size once per process and hands it out to a bounded
+    number of concurrent borrowers."""
+
+    def __init__(self, loader, max_concurrency=1, timeout=None):
+        self.loader = loader
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._models = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, size):
+        model = self._models.get(size)
+        if model is not None:
+            metrics.incr('speech.pool.hits')
+            return model
+
+        with self._lock:
+            model = self._models.get(size)
+            if model is not None:
+                metrics.incr('speech.pool.hits')
+                return model
+
+            metrics.incr('speech.pool.loads')
+            started = time.monotonic()
+            model = self.loader(size)
+            metrics.observe('speech.pool.load_seconds', time.monotonic() - started)
+
+            self._slots[size] = threading.BoundedSemaphore(self.max_concurrency)
+            self._models[size] = model
+        return model
+
+    def loaded_sizes(self):
+        return list(self._models)
+
+    @contextmanager
+    def borrow(self, size):
+        model = self.get_model(size)
+        slot = self._slots[size]
+
+        if not slot.acquire(blocking=False):
+            metrics.incr('speech.pool.waits')
+            started = time.monotonic()
+            acquired = slot.acquire(timeout=self.timeout)
+            metrics.observe('speech.pool.wait_seconds', time.monotonic() - started)
+            if not acquired:
+                metrics.incr('speech.pool.timeouts')
+                raise ModelPoolTimeout(f"No free '{size}' model after {self.timeout}s")
+
+        started = time.monotonic()
+        try:
+            yield model
+        finally:
+            metrics.observe('speech.inference_seconds', time.monotonic() - started)
+            slot.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def load_configured_model(size):
+    return get_speech_backend().load_model(size, precision=model_precision(size))
+
+
+def get_model_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ModelPool(
+                    load_configured_model,
+                    max_concurrency=settings.WHISPER_MAX_CONCURRENCY,
+                    timeout=settings.WHISPER_POOL_TIMEOUT,
+                )
+    return _pool
+
+
+def preload_models():
+    pool = get_model_pool()
+    for size in settings.WHISPER_PRELOAD:
+        pool.get_model(size)
@@ -55,6 +55,10 @@ class ExerciseAttempt(models.Model):
     time_taken_seconds = models.IntegerField(null=True, blank=True)
     
     audio_url = models.URLField(blank=True, null=True)
+    # Size of the upload as received, and of the file audio_url points at
+    # now (smaller once transcoded or downsampled).
+    audio_original_bytes = models.BigIntegerField(null=True, blank=True)
+    audio_bytes = models.BigIntegerField(null=True, blank=True)
     transcription = models.TextField(blank=True)
     confidence_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     pronunciation_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
@@ -65,6 +69,47 @@ class ExerciseAttempt(models.Model):
     
     class Meta:
         db_table = 'exercise_attempts'
+        indexes = [
+            # Storage GC looks attempts up by their audio file
+            models.Index(fields=['audio_url'], name='attempt_audio_url_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.student.email} - {self.exercise.title}"
\ No newline at end of file
+        return f"{self.student.email} - {self.exercise.title}"
+
+class SpeakingJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='speaking_jobs')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='speaking_jobs')
+    
+    audio_path = models.CharField(max_length=500)
+    audio_digest = models.CharField(max_length=64, blank=True)
+    reference_text = models.TextField(blank=True)
+    language = models.CharField(max_length=10, default='fr')
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    tries = models.IntegerField(default=0)
+    attempt = models.ForeignKey(ExerciseAttempt, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='speaking_jobs')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'speaking_jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='speaking_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.email} - {self.exercise.title} ({self.status})"
\ No newline at end of file
@@ -0,0 +1,45 @@
+from LinguaMaster.lru import lazy_lru
+from LinguaMaster.text import CompiledText
+
+# Pronunciation hints per language: (substring of the reference, hint, only
+# when the user's transcription lacks that substring too).
+FEEDBACK_RULES = {
+    'fr': [
+        ('on', "Try pronouncing 'on' more nasally.", True),
+        ('r', "Practice the French 'r' sound - it's softer than in English.", False),
+    ],
+}
+
+
+class CompiledReference:
+    """Everything scoring needs from a reference text, computed once: the
+    alignment tables and the language hints that can apply to it."""
+
+    def __init__(self, text, language):
+        self.text = text
+        self.language = language
+        self.lowered = text.lower()
+        self.alignment = CompiledText(text)
+        self.feedback_rules = [
+            (needle, hint, only_if_missing)
+            for needle, hint, only_if_missing in FEEDBACK_RULES.get(language, [])
+            if needle in self.lowered
+        ]
+
+    def feedback_hints(self, user_text):
+        lowered = user_text.lower()
+        return [
+            hint for needle, hint, only_if_missing in self.feedback_rules
+            if not only_if_missing or needle not in lowered
+        ]
+
+
+# Keyed by (exercise id, language, text). The text is part of the key, so
+# an exercise edited through another process is never scored against stale
+# tables; the Exercise signals in practice.signals drop entries edited here.
+get_reference_index = lazy_lru(
+    'SCORING_REFERENCE_CACHE_SIZE',
+    lambda text, language, exercise_id=None: CompiledReference(text, language),
+    lambda text, language, exercise_id=None: (exercise_id, language, text),
+    'scoring.reference',
+)
@@ -0,0 +1,33 @@
+import json
+
+
+def init_worker():
+    # Pool workers are spawned, not forked, so they never share the parent's
+    # database sockets; they only need Django configured to import scoring.
+    import django
+    django.setup()
+
+
+def load_analysis(value):
+    # whisper_analysis has been written both as a JSON object and as a
+    # json.dumps()'d string.
+    if isinstance(value, str):
+        try:
+            return json.loads(value), True
+        except ValueError:
+            return {}, True
+    return value or {}, False
+
+
+def rescore_rows(rows):
+    """Re-scores (id, transcription, reference_text, language) rows from the
+    stored transcriptions. Runs in a pool worker, so it only takes and
+    returns plain data."""
+    from .services import SpeechRecognitionService
+
+    service = SpeechRecognitionService()
+    results = service.score_transcriptions([
+        (transcription, reference_text, language)
+        for _, transcription, reference_text, language in rows
+    ])
+    return [(row[0], result) for row, result in zip(rows, results)]
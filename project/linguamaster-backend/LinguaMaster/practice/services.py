@@ -1,29 +1,71 @@
-import whisper
+import time
 from django.conf import settings
-from difflib import SequenceMatcher
+
+from LinguaMaster.metrics import metrics
+from LinguaMaster.text import char_similarity, char_similarity_batch
+
+from .alignment import align_words, align_words_batch
+from .model_pool import get_model_pool
+from .reference_index import get_reference_index
+from .speech_backends import get_speech_backend, model_variant
+from .tiering import get_tier_policy
+from .transcription_cache import file_digest, cache_transcription, get_cached_transcription
 
 class SpeechRecognitionService:
-    def __init__(self):
-        self.model = whisper.load_model("base")  # You can change model size: tiny, base, small, medium, large
+    def __init__(self, model_size=None, pool=None, backend=None, tier_policy=None):
+        # tiny, base, small, medium, large; without an explicit size the
+        # adaptive tier policy (if WHISPER_MODEL_TIERS is set) picks one per request
+        self.tier_policy = tier_policy or (get_tier_policy() if model_size is None else None)
+        self.model_size = model_size or (None if self.tier_policy else settings.WHISPER_MODEL_SIZE)
+        self.pool = pool or get_model_pool()
+        self.backend = backend or get_speech_backend()
     
-    def analyze_pronunciation(self, audio_file_path, reference_text, language="fr"):
+    def analyze_pronunciation(self, audio_file_path, reference_text, language="fr", audio_digest=None,
+                              exercise_id=None):
         try:
-            # Use local Whisper model for transcription
-            result = self.model.transcribe(audio_file_path, language=language)
-            transcription = result['text'].strip()
+            model_size, tier_decision = self.select_model()
             
-            accuracy_metrics = self._calculate_accuracy(transcription, reference_text, language)
-            feedback = self._generate_feedback(transcription, reference_text, accuracy_metrics, language)
-            score = self._calculate_score(accuracy_metrics)
+            # Retries and re-uploads of the same recording skip inference
+            digest = audio_digest or file_digest(audio_file_path)
+            variant = model_variant(model_size)
+            result = get_cached_transcription(digest, variant, language)
+            cached = result is not None
+            preprocessing = None
+            if not cached:
+                audio = self.backend.load_audio(audio_file_path)
+                if settings.SPEECH_VAD_ENABLED:
+                    audio, preprocessing = self._trim_silence(audio)
+                    if audio is None:
+                        return {
+                            'success': False,
+                            'no_speech': True,
+                            'error': 'No speech detected in the recording',
+                            'preprocessing': preprocessing
+                        }
+                
+                started = time.monotonic()
+                result = self._transcribe(model_size, audio, language)
+                inference_seconds = time.monotonic() - started
+                if self.tier_policy is not None:
+                    self.tier_policy.record(model_size, inference_seconds)
+                if preprocessing is not None:
+                    self._report_savings(preprocessing, inference_seconds)
+                cache_transcription(digest, variant, language, result)
+            transcription = result['text'].strip()
             
             return {
                 'success': True,
                 'transcription': transcription,
                 'confidence': 0.8,  # Local whisper doesn't provide confidence, using default
-                'accuracy': accuracy_metrics['overall_accuracy'],
-                'metrics': accuracy_metrics,
-                'feedback': feedback,
-                'score': score
+                **self.score_transcription(transcription, reference_text, language, exercise_id),
+                # Kept so attempts can be re-scored later without Whisper
+                'reference_text': reference_text,
+                'language': language,
+                'model': variant,
+                'model_tier': model_size,
+                'tier_decision': tier_decision,
+                'cached': cached,
+                'preprocessing': preprocessing
             }
         except Exception as e:
             return {
@@ -31,23 +73,109 @@ class SpeechRecognitionService:
                 'error': str(e)
             }
     
-    def _calculate_accuracy(self, user_text, reference_text, language):
-        similarity = SequenceMatcher(None, user_text.lower(), reference_text.lower()).ratio()
-        user_words = user_text.lower().split()
-        reference_words = reference_text.lower().split()
+    def score_transcription(self, transcription, reference_text, language, exercise_id=None):
+        # Reference-side tokens, alignment tables and hints are compiled once
+        # per exercise; only the transcription is processed per attempt
+        reference = get_reference_index().get(reference_text, language, exercise_id)
+        return self.score_against(transcription, reference, language)
+    
+    def score_against(self, transcription, reference, language):
+        accuracy_metrics = self._calculate_accuracy(transcription, reference, language)
+        return self._score(transcription, reference, accuracy_metrics, language)
+    
+    def score_transcriptions(self, items):
+        """Scores many (transcription, reference_text, language) triples with
+        one batched alignment pass; same results as score_transcription."""
+        index = get_reference_index()
+        references = [index.get(reference_text, language) for _, reference_text, language in items]
+        pairs = [(reference.alignment, transcription)
+                 for (transcription, _, _), reference in zip(items, references)]
+        alignments = align_words_batch(pairs)
+        similarities = char_similarity_batch(pairs)
         
-        correct_words = sum(1 for uw, rw in zip(user_words, reference_words) if uw == rw)
-        word_error_rate = (len(reference_words) - correct_words) / max(len(reference_words), 1) * 100
+        return [
+            self._score(transcription, reference,
+                        self._accuracy_metrics(alignment, similarity), language)
+            for (transcription, _, language), reference, alignment, similarity
+            in zip(items, references, alignments, similarities)
+        ]
+    
+    def _score(self, transcription, reference, accuracy_metrics, language):
+        feedback = self._generate_feedback(transcription, reference, accuracy_metrics, language)
         
+        return {
+            'accuracy': accuracy_metrics['overall_accuracy'],
+            'metrics': accuracy_metrics,
+            'feedback': feedback,
+            'score': self._calculate_score(accuracy_metrics)
+        }
+    
+    def select_model(self):
+        if self.model_size:
+            return self.model_size, None
+        decision = self.tier_policy.choose()
+        return decision['tier'], decision
+    
+    def transcribe_audio(self, audio, language, model_size):
+        """Transcribes an in-memory 16 kHz float32 clip as-is: no cache, no
+        silence trimming. Used for live streams."""
+        return self._transcribe(model_size, audio, language)['text'].strip()
+    
+    def _transcribe(self, model_size, audio, language):
+        if settings.WHISPER_BATCHING:
+            # Concurrent submissions share one encoder pass
+            from .batching import get_batcher
+            return get_batcher(model_size).transcribe(audio, language)
+        
+        # Borrow the process-wide warm model instead of loading weights per request
+        with self.pool.borrow(model_size) as model:
+            return self.backend.transcribe(model, audio, language)
+    
+    def _trim_silence(self, audio):
+        from .audio import trim_silence
+        
+        trimmed, report = trim_silence(
+            audio,
+            threshold_db=settings.SPEECH_VAD_THRESHOLD_DB,
+            padding_ms=settings.SPEECH_VAD_PADDING_MS,
+            min_speech_ms=settings.SPEECH_VAD_MIN_SPEECH_MS
+        )
+        metrics.observe('speech.vad.trimmed_seconds', report['trimmed_seconds'])
+        if trimmed is None:
+            metrics.incr('speech.vad.rejected')
+        return trimmed, report
+    
+    def _report_savings(self, report, inference_seconds):
+        # Inference time grows roughly with the audio decoded, so the
+        # trimmed part is credited at the rate measured on the kept part.
+        # An estimate: the encoder pads to 30 s windows either way.
+        saved = inference_seconds * report['trimmed_seconds'] / report['kept_seconds']
+        
+        report['inference_seconds'] = inference_seconds
+        report['estimated_seconds_saved'] = saved
+        metrics.observe('speech.vad.inference_seconds', inference_seconds)
+        metrics.observe('speech.vad.seconds_saved', saved)
+    
+    def _calculate_accuracy(self, user_text, reference, language):
+        return self._accuracy_metrics(
+            align_words(reference.alignment, user_text),
+            char_similarity(reference.alignment, user_text)
+        )
+    
+    def _accuracy_metrics(self, alignment, similarity):
         return {
             'overall_accuracy': similarity * 100,
-            'word_error_rate': word_error_rate,
-            'word_accuracy': max(0, 100 - word_error_rate),
-            'words_correct': correct_words,
-            'total_words': len(reference_words)
+            'word_error_rate': alignment['wer'],
+            'word_accuracy': max(0, 100 - alignment['wer']),
+            'words_correct': alignment['hits'],
+            'total_words': alignment['reference_words'],
+            'substitutions': alignment['substitutions'],
+            'deletions': alignment['deletions'],
+            'insertions': alignment['insertions'],
+            'word_alignment': alignment['operations']
         }
     
-    def _generate_feedback(self, user_text, reference_text, metrics, language):
+    def _generate_feedback(self, user_text, reference, metrics, language):
         feedback = []
         accuracy = metrics['overall_accuracy']
         
@@ -60,11 +188,7 @@ class SpeechRecognitionService:
         else:
             feedback.append("Let's work on pronunciation basics.")
         
-        if language == 'fr':
-            if 'on' in reference_text.lower() and 'on' not in user_text.lower():
-                feedback.append("Try pronouncing 'on' more nasally.")
-            if 'r' in reference_text.lower():
-                feedback.append("Practice the French 'r' sound - it's softer than in English.")
+        feedback.extend(reference.feedback_hints(user_text))
         
         return feedback
     
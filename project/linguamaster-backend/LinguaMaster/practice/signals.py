@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from courses.models import Exercise
+
+from .reference_index import get_reference_index
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_exercise_reference(sender, instance, **kwargs):
+    get_reference_index().invalidate(instance.pk)
@@ -0,0 +1,194 @@
+import ctypes
+import os
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+SAMPLE_RATE = 16000
+# Whisper decodes fixed 30 second windows.
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+PRECISIONS = ('fp32', 'int8')
+
+
+class SpeechBackendUnavailable(Exception):
+    pass
+
+
+def model_precision(size):
+    return 'int8' if size in settings.WHISPER_INT8_MODELS else 'fp32'
+
+
+def model_variant(size):
+    # Identifies the weights actually served, e.g. for cache keys: an int8
+    # model can transcribe the same clip slightly differently.
+    precision = model_precision(size)
+    return size if precision == 'fp32' else f'{size}-{precision}'
+
+
+def release_free_memory():
+    # Whisper() allocates private fp32 parameters that are replaced, and
+    # freed, as soon as the mapped ones are assigned; glibc keeps most of
+    # that in its heap unless asked to hand it back.
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def mmap_checkpoint(size):
+    """(path, alignment heads) of an fp32 copy of the `size` checkpoint
+    suitable for mmap loading, created on first use. Released checkpoints
+    store fp16 weights, which would otherwise be converted (i.e. copied) at
+    load time. `size` may also be the path of a checkpoint file. Returns
+    None when the checkpoint cannot be located."""
+    import torch
+    import whisper
+
+    # Not public API: a whisper release without these simply loses mmap.
+    models = getattr(whisper, '_MODELS', None)
+    download = getattr(whisper, '_download', None)
+    all_alignment_heads = getattr(whisper, '_ALIGNMENT_HEADS', None)
+    if models is not None and size in models:
+        if download is None or all_alignment_heads is None or size not in all_alignment_heads:
+            return None
+        download_root = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'whisper')
+        source = download(models[size], download_root, False)
+        alignment_heads = all_alignment_heads[size]
+    elif os.path.isfile(size):
+        source, alignment_heads = size, None
+    else:
+        return None
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    path = os.path.join(settings.WHISPER_MMAP_DIR, f'{name}-fp32.pt')
+    if not os.path.exists(path):
+        os.makedirs(settings.WHISPER_MMAP_DIR, exist_ok=True)
+        checkpoint = torch.load(source, map_location='cpu', weights_only=True)
+        checkpoint['model_state_dict'] = {
+            key: value.float().contiguous() for key, value in checkpoint['model_state_dict'].items()
+        }
+        # Several workers may convert at once; each renames its own file.
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        torch.save(checkpoint, tmp_path)
+        os.replace(tmp_path, path)
+    return path, alignment_heads
+
+
+class SpeechBackend:
+    """Everything the speaking pipeline needs from an ASR stack. Backends must
+    import their ML dependencies inside methods, never at module level, so
+    that loading Django does not pull in torch."""
+
+    name = None
+
+    def load_model(self, size, precision='fp32'):
+        raise NotImplementedError
+
+    def load_audio(self, path):
+        raise NotImplementedError
+
+    def transcribe(self, model, audio, language):
+        raise NotImplementedError
+
+    def decode_batch(self, model, audios, language):
+        raise NotImplementedError
+
+
+class WhisperBackend(SpeechBackend):
+    name = 'whisper'
+
+    def load_model(self, size, precision='fp32'):
+        import torch
+        import whisper
+
+        if precision == 'fp32':
+            if settings.WHISPER_MMAP_WEIGHTS and not torch.cuda.is_available():
+                return self._load_mmap(size)
+            return whisper.load_model(size)
+        if precision != 'int8':
+            raise ValueError(f'Unsupported precision: {precision}')
+
+        # Dynamic int8 quantization is CPU-only: Linear weights are stored as
+        # int8 and activations are quantized on the fly per batch.
+        model = whisper.load_model(size, device='cpu')
+        for module in model.modules():
+            # whisper's Linear only adds a dtype cast that is a no-op in fp32;
+            # quantize_dynamic matches modules by exact type.
+            if isinstance(module, whisper.model.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+    def _load_mmap(self, size):
+        # The weights stay in a file mapping backed by the page cache, so every
+        # process serving this model shares one physical copy of them.
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+
+        checkpoint_path = mmap_checkpoint(size)
+        if checkpoint_path is None:
+            return whisper.load_model(size)
+        path, alignment_heads = checkpoint_path
+        checkpoint = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        model = Whisper(ModelDimensions(**checkpoint['dims']))
+        # assign=True adopts the mapped tensors as they are instead of
+        # copying them into the freshly allocated parameters.
+        model.load_state_dict(checkpoint['model_state_dict'], assign=True)
+        if alignment_heads is not None:
+            model.set_alignment_heads(alignment_heads)
+        release_free_memory()
+        return model
+
+    def load_audio(self, path):
+        import whisper
+        return whisper.load_audio(path)
+
+    def transcribe(self, model, audio, language):
+        return model.transcribe(audio, language=language)
+
+    def decode_batch(self, model, audios, language):
+        import torch
+        import whisper
+
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+            for audio in audios
+        ]).to(model.device)
+        options = whisper.DecodingOptions(
+            language=language,
+            without_timestamps=True,
+            fp16=model.device.type == 'cuda'
+        )
+        return [result.text for result in whisper.decode(model, mels, options)]
+
+
+class DisabledBackend(SpeechBackend):
+    """For web processes deployed without torch/whisper. Pair it with
+    SPEAKING_QUEUE_BACKEND='database' so that analysis only ever runs in
+    run_speaking_workers processes."""
+
+    name = 'disabled'
+
+    def _unavailable(self, *args, **kwargs):
+        raise SpeechBackendUnavailable(
+            'Speech recognition is not available in this process (SPEECH_BACKEND is disabled)'
+        )
+
+    load_model = load_audio = transcribe = decode_batch = _unavailable
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_speech_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.SPEECH_BACKEND)()
+    return _backend
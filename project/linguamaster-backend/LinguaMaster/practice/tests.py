@@ -1,3 +1,1003 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+import numpy as np
+from channels.db import database_sync_to_async
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:  # channels.testing needs daphne
+    WebsocketCommunicator = None
+
+from courses.models import Language, Course, Module, Lesson, Exercise
+from users.models import User
+from LinguaMaster.media import media_token
+from LinguaMaster.text import char_similarity
+from . import alignment
+from .audio import trim_silence
+from .alignment import align_words, align_words_batch
+from .model_pool import ModelPool, ModelPoolTimeout
+from .media import can_read_media
+from .models import ExerciseAttempt, SpeakingJob, StudentEnrollment
+from .rescoring import rescore_rows
+from .reference_index import get_reference_index
+from .services import SpeechRecognitionService
+from .speech_backends import WINDOW_SAMPLES, WhisperBackend
+from .tiering import AdaptiveTierPolicy
+from .transcription_cache import cache_transcription, file_digest, get_cached_transcription
+from .transcoding import OPUS_SUFFIX, transcode_attempt_audio
+from .uploads import sharded_name
+from .admission import AdmissionController, AdmissionRejected
+from .consumers import CLOSE_BAD_REQUEST, CLOSE_UNAVAILABLE, SpeakingConsumer
+from .batching import MicroBatcher
+from .jobs import claim_job, enqueue_speaking_job, requeue_stale_jobs, run_speaking_job
+from .views import SpeakingPracticeView, attempt_audio_url
+
+
+class SpeakingUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        self.exercise = Exercise.objects.create(
+            lesson=lesson,
+            exercise_type='speaking',
+            title='Say hello',
+            correct_answer='bonjour',
+            order_index=1
+        )
+    
+    def _post(self, payload):
+        request = APIRequestFactory().post('/api/practice/speaking/', {
+            'audio': SimpleUploadedFile('clip.webm', payload, content_type='audio/webm'),
+            'exercise_id': str(self.exercise.id),
+        }, format='multipart')
+        force_authenticate(request, user=self.user)
+        
+        # The request body is built above; only the view's own allocations
+        # are traced.
+        tracemalloc.start()
+        try:
+            response = SpeakingPracticeView.as_view()(request)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return response, peak
+    
+    def test_upload_is_streamed_to_storage(self):
+        payload = os.urandom(1024) * 16 * 1024  # 16 MB
+        
+        with override_settings(MEDIA_ROOT=self.media_root, SPEAKING_QUEUE_BACKEND='database',
+                               SPEAKING_UPLOAD_MAX_BYTES=32 * 1024 * 1024):
+            response, peak = self._post(payload)
+            
+            self.assertEqual(response.status_code, 202)
+            job = SpeakingJob.objects.get(id=response.data['job_id'])
+            self.assertEqual(default_storage.size(job.audio_path), len(payload))
+        
+        # Peak memory for the whole request stays far below the upload size.
+        self.assertLess(peak, 4 * 1024 * 1024)
+    
+    def test_oversized_upload_is_rejected_and_removed(self):
+        with override_settings(MEDIA_ROOT=self.media_root, SPEAKING_QUEUE_BACKEND='database',
+                               SPEAKING_UPLOAD_MAX_BYTES=1024 * 1024):
+            response, _ = self._post(os.urandom(2 * 1024 * 1024))
+        
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(SpeakingJob.objects.exists())
+        stored = [files for _, _, files in os.walk(self.media_root) if files]
+        self.assertEqual(stored, [])
+    
+    def test_user_over_job_backlog_is_shed(self):
+        SpeakingJob.objects.create(student=self.user, exercise=self.exercise,
+                                   audio_path='speaking_practice/queued.webm')
+        
+        with override_settings(MEDIA_ROOT=self.media_root, SPEAKING_QUEUE_BACKEND='database',
+                               SPEAKING_MAX_PENDING_JOBS_PER_USER=1):
+            response, _ = self._post(os.urandom(1024))
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(SpeakingJob.objects.count(), 1)
+    
+    def test_request_without_a_slot_gets_503_and_retry_after(self):
+        controller = AdmissionController(max_in_flight=4, per_user=1, max_waiting=0,
+                                         wait_timeout=0, retry_after=7)
+        with override_settings(MEDIA_ROOT=self.media_root, SPEAKING_QUEUE_BACKEND='database'), \
+                mock.patch('practice.views.get_admission_controller', lambda: controller), \
+                controller.admit(self.user.pk):
+            response, _ = self._post(os.urandom(1024))
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertFalse(SpeakingJob.objects.exists())
+    
+    def test_backlog_is_checked_again_when_the_job_is_queued(self):
+        SpeakingJob.objects.create(student=self.user, exercise=self.exercise,
+                                   audio_path='speaking_practice/queued.webm')
+        
+        with override_settings(SPEAKING_MAX_PENDING_JOBS_PER_USER=1), self.assertRaises(AdmissionRejected):
+            enqueue_speaking_job(self.user, self.exercise, 'speaking_practice/next.webm', '', 'fr')
+        self.assertEqual(SpeakingJob.objects.count(), 1)
+    
+    def test_transcoded_audio_replaces_original(self):
+        def encode(source_path, target_path, bitrate):
+            with open(target_path, 'wb') as f:
+                f.write(b'opus' * 16)
+        
+        with override_settings(MEDIA_ROOT=self.media_root):
+            name = default_storage.save('speaking_practice/ab/cd/clip.webm', ContentFile(os.urandom(4096)))
+            attempt = ExerciseAttempt.objects.create(student=self.user, exercise=self.exercise,
+                                                     is_correct=False, score=0, audio_url=name)
+            
+            with mock.patch('practice.transcoding.encode_opus', encode):
+                self.assertEqual(transcode_attempt_audio(attempt.id), (4096, 64))
+            
+            attempt.refresh_from_db()
+            self.assertTrue(attempt.audio_url.endswith(OPUS_SUFFIX))
+            self.assertEqual((attempt.audio_original_bytes, attempt.audio_bytes), (4096, 64))
+            self.assertFalse(default_storage.exists(name))
+            self.assertTrue(default_storage.exists(attempt.audio_url))
+    
+    def test_attempt_audio_supports_range_and_conditional_requests(self):
+        audio = os.urandom(10000)
+        client = APIClient()
+        
+        with override_settings(MEDIA_ROOT=self.media_root):
+            name = default_storage.save('speaking_practice/ab/cd/clip.webm', ContentFile(audio))
+            attempt = ExerciseAttempt.objects.create(student=self.user, exercise=self.exercise,
+                                                     is_correct=False, score=0, audio_url=name)
+            url = f'/api/practice/attempts/{attempt.id}/audio/'
+            
+            client.force_authenticate(self.user)
+            response = client.get(url, HTTP_RANGE='bytes=100-199')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], 'bytes 100-199/10000')
+            self.assertEqual(b''.join(response.streaming_content), audio[100:200])
+            
+            response = client.get(url, HTTP_RANGE='bytes=20000-')
+            self.assertEqual(response.status_code, 416)
+            
+            etag = client.get(url)['ETag']
+            self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            
+            other = User.objects.create_user('other@example.com', 'Passw0rd!', username='other')
+            client.force_authenticate(other)
+            self.assertEqual(client.get(url).status_code, 404)
+            self.assertEqual(client.get(f'/media/{name}').status_code, 404)
+            
+            client.force_authenticate(None)
+            token_url = f'/media/{name}?token=' + media_token(self.user, f'/media/{name}')
+            response = client.get(token_url, HTTP_RANGE='bytes=-10')
+            self.assertEqual(b''.join(response.streaming_content), audio[-10:])
+    
+    def test_media_token_only_opens_the_signed_path(self):
+        client = APIClient()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            attempts = []
+            for name in ('speaking_practice/ab/cd/one.webm', 'speaking_practice/ab/cd/two.webm'):
+                name = default_storage.save(name, ContentFile(b'audio'))
+                attempts.append(ExerciseAttempt.objects.create(
+                    student=self.user, exercise=self.exercise, is_correct=False, score=0, audio_url=name
+                ))
+            
+            signed = attempt_audio_url(attempts[0].id, self.user)
+            self.assertEqual(client.get(signed).status_code, 200)
+            
+            token = signed.split('?token=')[1]
+            other = f'/api/practice/attempts/{attempts[1].id}/audio/?token={token}'
+            self.assertEqual(client.get(other).status_code, 403)
+            self.assertEqual(client.get(f'/media/{attempts[1].audio_url}?token={token}').status_code, 403)
+    
+    def test_exercise_edit_drops_compiled_reference(self):
+        index = get_reference_index()
+        reference = index.get('bonjour', 'fr', self.exercise.id)
+        self.assertIs(index.get('bonjour', 'fr', self.exercise.id), reference)
+        
+        self.exercise.correct_answer = 'bonsoir'
+        self.exercise.save()
+        
+        self.assertIsNot(index.get('bonjour', 'fr', self.exercise.id), reference)
+
+
+class ModelPoolTests(SimpleTestCase):
+    def test_each_size_is_loaded_once_and_shared(self):
+        loads = []
+        pool = ModelPool(lambda size: loads.append(size) or object(), max_concurrency=2)
+        
+        with pool.borrow('base') as first, pool.borrow('base') as second:
+            self.assertIs(first, second)
+        pool.get_model('small')
+        self.assertEqual(loads, ['base', 'small'])
+        self.assertEqual(pool.loaded_sizes(), ['base', 'small'])
+    
+    def test_borrowers_beyond_the_limit_wait_for_a_slot(self):
+        pool = ModelPool(lambda size: object(), max_concurrency=1, timeout=5)
+        holding, released = threading.Event(), threading.Event()
+        
+        def hold():
+            with pool.borrow('base'):
+                holding.set()
+                released.wait(5)
+        
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait(5)
+        threading.Timer(0.05, released.set).start()
+        
+        started = time.monotonic()
+        with pool.borrow('base'):
+            self.assertGreaterEqual(time.monotonic() - started, 0.04)
+        holder.join()
+    
+    def test_borrow_times_out_when_no_slot_frees_up(self):
+        pool = ModelPool(lambda size: object(), max_concurrency=1, timeout=0.05)
+        with pool.borrow('base'):
+            with self.assertRaises(ModelPoolTimeout), pool.borrow('base'):
+                pass
+        with pool.borrow('base'):
+            pass
+
+
+class FakeBatchBackend:
+    def __init__(self):
+        self.batches = []
+    
+    def decode_batch(self, model, audios, language):
+        self.batches.append(len(audios))
+        return [f'{language}:{len(audio)}' for audio in audios]
+    
+    def transcribe(self, model, audio, language):
+        return {'text': 'long clip'}
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def _batcher(self, **options):
+        backend = FakeBatchBackend()
+        pool = ModelPool(lambda size: object(), max_concurrency=1)
+        return MicroBatcher(pool, 'base', backend=backend, **options), backend
+    
+    def _transcribe_concurrently(self, batcher, clips):
+        results = [None] * len(clips)
+        
+        def run(index, length, language):
+            results[index] = batcher.transcribe(np.zeros(length, dtype=np.float32), language, timeout=5)
+        
+        threads = [threading.Thread(target=run, args=(index, *clip)) for index, clip in enumerate(clips)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_full_batch_is_decoded_without_waiting_out_the_window(self):
+        batcher, backend = self._batcher(max_batch_size=3, max_wait_ms=10_000)
+        
+        started = time.monotonic()
+        results = self._transcribe_concurrently(batcher, [(100, 'fr'), (200, 'fr'), (300, 'fr')])
+        
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(backend.batches, [3])
+        self.assertEqual(results, [{'text': 'fr:100'}, {'text': 'fr:200'}, {'text': 'fr:300'}])
+    
+    def test_partial_batch_is_decoded_when_the_window_closes(self):
+        batcher, backend = self._batcher(max_batch_size=8, max_wait_ms=20)
+        
+        started = time.monotonic()
+        result = batcher.transcribe(np.zeros(100, dtype=np.float32), 'fr', timeout=5)
+        
+        self.assertGreaterEqual(time.monotonic() - started, 0.015)
+        self.assertEqual(result, {'text': 'fr:100'})
+        self.assertEqual(backend.batches, [1])
+    
+    def test_languages_are_never_decoded_together(self):
+        batcher, backend = self._batcher(max_batch_size=2, max_wait_ms=10_000)
+        
+        results = self._transcribe_concurrently(batcher, [(100, 'fr'), (200, 'en')])
+        
+        self.assertEqual(backend.batches, [1, 1])
+        self.assertEqual(results, [{'text': 'fr:100'}, {'text': 'en:200'}])
+    
+    def test_clips_longer_than_a_window_bypass_the_batch(self):
+        batcher, backend = self._batcher()
+        self.assertEqual(batcher.transcribe(np.zeros(WINDOW_SAMPLES + 1, dtype=np.float32), 'fr'),
+                         {'text': 'long clip'})
+        self.assertEqual(backend.batches, [])
+
+
+class AdaptiveTierPolicyTests(SimpleTestCase):
+    def _policy(self, depth):
+        # Tiers from fastest to most accurate; p95 0.2 s, 0.5 s and 1.2 s.
+        policy = AdaptiveTierPolicy(['tiny', 'base', 'small'], slo_seconds=1.5, capacity=2,
+                                    depth_func=lambda: depth[0], depth_ttl=0)
+        for tier, seconds in (('tiny', 0.2), ('base', 0.5), ('small', 1.2)):
+            for _ in range(20):
+                policy.record(tier, seconds)
+        return policy
+    
+    def test_backlog_moves_requests_to_faster_tiers(self):
+        depth = [0]
+        policy = self._policy(depth)
+        
+        chosen = []
+        for depth[0] in (0, 1, 4, 12):
+            chosen.append(policy.choose()['tier'])
+        # stretch = 1 + depth / 2: 1.2 s fits at 1x; 0.5 s up to 3x; 0.2 s up to 7.5x
+        self.assertEqual(chosen, ['small', 'base', 'base', 'tiny'])
+    
+    def test_fastest_tier_when_nothing_meets_the_slo(self):
+        policy = self._policy([40])
+        decision = policy.choose()
+        self.assertEqual(decision['tier'], 'tiny')
+        self.assertTrue(decision['slo_missed'])
+        self.assertAlmostEqual(decision['predicted_seconds'], 0.2 * 21)
+    
+    def test_unmeasured_tier_is_tried_first(self):
+        policy = AdaptiveTierPolicy(['tiny', 'small'], slo_seconds=1, depth_func=lambda: 100)
+        policy.record('tiny', 0.1)
+        self.assertEqual(policy.choose()['tier'], 'small')
+    
+    def test_queue_depth_is_cached_for_depth_ttl(self):
+        calls = []
+        policy = AdaptiveTierPolicy(['tiny'], slo_seconds=1, depth_func=lambda: calls.append(1) or 3,
+                                    depth_ttl=60)
+        self.assertEqual([policy.queue_depth() for _ in range(3)], [3, 3, 3])
+        self.assertEqual(len(calls), 1)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def _controller(self, **options):
+        options = {'max_in_flight': 1, 'per_user': 1, 'max_waiting': 1, 'wait_timeout': 0.05,
+                   'retry_after': 5, **options}
+        return AdmissionController(**options)
+    
+    def test_one_user_cannot_take_more_than_its_share(self):
+        controller = self._controller(max_in_flight=4)
+        with controller.admit('alice'):
+            with self.assertRaises(AdmissionRejected) as rejected, controller.admit('alice'):
+                pass
+            self.assertEqual(rejected.exception.reason, 'per_user')
+            with controller.admit('bob'):
+                pass
+    
+    def test_waiter_gets_the_slot_when_it_frees_up(self):
+        controller = self._controller(wait_timeout=5)
+        controller.acquire('alice')
+        threading.Timer(0.05, controller.release, ['alice']).start()
+        
+        with controller.admit('bob'):
+            self.assertEqual(controller._in_flight, 1)
+        self.assertEqual(controller._in_flight, 0)
+    
+    def test_waiter_is_shed_on_timeout_and_beyond_the_queue(self):
+        controller = self._controller()
+        with controller.admit('alice'):
+            with self.assertRaises(AdmissionRejected) as rejected:
+                controller.acquire('bob')
+            self.assertEqual((rejected.exception.reason, rejected.exception.retry_after), ('timeout', 5))
+            
+            controller.max_waiting = 0
+            with self.assertRaises(AdmissionRejected) as rejected:
+                controller.acquire('carol')
+            self.assertEqual(rejected.exception.reason, 'capacity')
+        self.assertEqual((controller._in_flight, controller._waiting, dict(controller._by_user)), (0, 0, {}))
+
+
+class RescoreAttemptsTests(TestCase):
+    def setUp(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        self.checkpoint = os.path.join(workdir, 'rescore.json')
+        
+        user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        exercise = Exercise.objects.create(lesson=lesson, exercise_type='speaking', title='Say hello',
+                                           correct_answer='bonjour le monde', order_index=1)
+        self.attempts = [
+            ExerciseAttempt.objects.create(student=user, exercise=exercise, is_correct=False, score=0,
+                                           transcription='bonjour le monde', whisper_analysis={'score': 0})
+            for _ in range(3)
+        ]
+        
+        # Scoring runs in threads here; spawning processes only costs time.
+        patcher = mock.patch('practice.management.commands.rescore_attempts.ProcessPoolExecutor',
+                             lambda workers, **kwargs: ThreadPoolExecutor(workers))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _rescore(self, *args):
+        out = StringIO()
+        call_command('rescore_attempts', '--workers=1', '--batch-size=1',
+                     f'--checkpoint={self.checkpoint}', *args, stdout=out)
+        return out.getvalue()
+    
+    def _scores(self):
+        return [ExerciseAttempt.objects.get(id=attempt.id).score for attempt in self.attempts]
+    
+    def test_interrupted_run_resumes_after_the_last_saved_batch(self):
+        batches = []
+        
+        def fail_second_batch(rows):
+            batches.append(rows)
+            if len(batches) == 2:
+                raise RuntimeError('worker died')
+            return rescore_rows(rows)
+        
+        with mock.patch('practice.management.commands.rescore_attempts.rescore_rows', fail_second_batch), \
+                self.assertRaises(RuntimeError):
+            self._rescore()
+        
+        rescored = [score for score in self._scores() if score]
+        self.assertEqual(len(rescored), 1)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['processed'], 1)
+        
+        output = self._rescore()
+        self.assertIn('Resuming after 1 attempts', output)
+        self.assertIn('Re-scored 2 attempts', output)
+        self.assertEqual(self._scores(), rescored * 3)
+    
+    def test_restart_ignores_the_checkpoint(self):
+        self._rescore()
+        ExerciseAttempt.objects.update(score=0, whisper_analysis={'score': 0})
+        
+        self.assertIn('Re-scored 0 attempts', self._rescore())
+        self.assertEqual(self._scores(), [0, 0, 0])
+        self.assertIn('Re-scored 3 attempts', self._rescore('--restart'))
+        self.assertNotIn(0, self._scores())
+
+
+class GcSpeakingAudioTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, SPEAKING_AUDIO_GC_GRACE_HOURS=24,
+                                  SPEAKING_AUDIO_DOWNSAMPLE_DAYS=0, SPEAKING_AUDIO_RETENTION_DAYS=365)
+        media.enable()
+        self.addCleanup(media.disable)
+        
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        self.exercise = Exercise.objects.create(lesson=lesson, exercise_type='speaking', title='Say hello',
+                                                correct_answer='bonjour', order_index=1)
+    
+    def _file(self, key, age_hours=48):
+        name = default_storage.save(sharded_name(key, f'{key}_clip.webm'), ContentFile(b'x' * 100))
+        mtime = time.time() - age_hours * 3600
+        os.utime(default_storage.path(name), (mtime, mtime))
+        return name
+    
+    def _attempt(self, audio_url, age_days=0):
+        attempt = ExerciseAttempt.objects.create(student=self.user, exercise=self.exercise, is_correct=True,
+                                                 score=100, audio_url=audio_url)
+        ExerciseAttempt.objects.filter(id=attempt.id).update(
+            attempted_at=timezone.now() - timedelta(days=age_days)
+        )
+        return attempt
+    
+    def _gc(self, *args):
+        out = StringIO()
+        call_command('gc_speaking_audio', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+    
+    def test_old_orphans_are_removed(self):
+        orphan = self._file('aa11')
+        
+        output = self._gc('--skip-retention')
+        
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertIn('orphans=1, orphan_bytes=100', output)
+    
+    def test_referenced_and_recent_files_are_kept(self):
+        attempt_audio = self._file('bb22')
+        self._attempt(attempt_audio)
+        job_audio = self._file('cc33')
+        SpeakingJob.objects.create(student=self.user, exercise=self.exercise, audio_path=job_audio)
+        upload_in_progress = self._file('dd44', age_hours=1)
+        
+        output = self._gc('--skip-retention')
+        
+        for name in (attempt_audio, job_audio, upload_in_progress):
+            self.assertTrue(default_storage.exists(name), name)
+        self.assertIn('scanned=3, recent=1, orphans=0', output)
+    
+    def test_audio_past_retention_is_dropped(self):
+        expired = self._attempt(self._file('ee55'), age_days=400)
+        current = self._attempt(self._file('ff66'), age_days=300)
+        
+        output = self._gc('--skip-orphans')
+        
+        expired.refresh_from_db()
+        current.refresh_from_db()
+        self.assertIsNone(expired.audio_url)
+        self.assertFalse(default_storage.exists(sharded_name('ee55', 'ee55_clip.webm')))
+        self.assertTrue(default_storage.exists(current.audio_url))
+        self.assertIn('expired=1, expired_bytes=100', output)
+    
+    def test_dry_run_reports_without_changing_anything(self):
+        orphan = self._file('aa11')
+        expired = self._attempt(self._file('ee55'), age_days=400)
+        audio_url = expired.audio_url
+        
+        output = self._gc('--dry-run')
+        
+        expired.refresh_from_db()
+        self.assertEqual(expired.audio_url, audio_url)
+        self.assertTrue(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(audio_url))
+        self.assertTrue(output.startswith('[dry run] '))
+        self.assertIn('orphans=1', output)
+        self.assertIn('expired=1', output)
+
+
+class CourseMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        for name in ('courses/cover.png', 'lessons/free.mp3', 'lessons/paid.mp3', 'lessons/other.mp3'):
+            default_storage.save(name, ContentFile(b'media'))
+        
+        self.author = User.objects.create_user('author@example.com', 'Passw0rd!', username='author')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        free = Course.objects.create(language=language, title='Free', description='Basics', is_free=True,
+                                     thumbnail_url='https://cdn.example.com/media/courses/cover.png')
+        self.paid = Course.objects.create(language=language, title='Paid', description='More',
+                                          created_by=self.author)
+        self.lessons = {}
+        for course, name in ((free, 'free'), (self.paid, 'paid')):
+            module = Module.objects.create(course=course, title='Module', order_index=1)
+            self.lessons[name] = Lesson.objects.create(
+                module=module, title='Lesson', order_index=1,
+                content_url=f'https://cdn.example.com/media/lessons/{name}.mp3'
+            )
+    
+    def test_public_media_loads_without_credentials(self):
+        client = APIClient()
+        self.assertEqual(client.get('/media/courses/cover.png').status_code, 200)
+        self.assertEqual(client.get('/media/lessons/free.mp3').status_code, 200)
+        self.assertEqual(client.get('/media/lessons/paid.mp3').status_code, 404)
+        
+        student = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        client.force_authenticate(student)
+        self.assertEqual(client.get('/media/lessons/paid.mp3').status_code, 404)
+        StudentEnrollment.objects.create(student=student, course=self.paid)
+        self.assertEqual(client.get('/media/lessons/paid.mp3').status_code, 200)
+    
+    def test_media_is_resolved_by_exact_name(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(can_read_media(self.author, 'lessons/paid.mp3'))
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('LIKE' in query['sql'].upper() for query in queries))
+        
+        lesson = self.lessons['paid']
+        lesson.content_url = 'https://cdn.example.com/media/lessons/other.mp3'
+        lesson.save()
+        self.assertFalse(can_read_media(self.author, 'lessons/paid.mp3'))
+        self.assertTrue(can_read_media(self.author, 'lessons/other.mp3'))
+        
+        lesson.delete()
+        self.assertFalse(can_read_media(self.author, 'lessons/other.mp3'))
+
+
+class FakeSpeechService:
+    def __init__(self, error=None):
+        self.error = error
+    
+    def analyze_pronunciation(self, audio_path, reference_text, language, **kwargs):
+        if self.error:
+            raise self.error
+        return {'success': True, 'transcription': 'bonjour', 'confidence': 0.9,
+                'accuracy': 100, 'score': 95, 'feedback': []}
+
+
+@override_settings(SPEAKING_AUDIO_TRANSCODE=False, SPEAKING_JOB_TIMEOUT=60, SPEAKING_JOB_MAX_TRIES=2)
+class SpeakingJobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        self.exercise = Exercise.objects.create(lesson=lesson, exercise_type='speaking', title='Say hello',
+                                                correct_answer='bonjour', order_index=1)
+    
+    def _job(self, **fields):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            path = default_storage.save('speaking_practice/clip.webm', ContentFile(b'audio'))
+        return SpeakingJob.objects.create(student=self.user, exercise=self.exercise, audio_path=path, **fields)
+    
+    def test_claim_takes_the_oldest_queued_job_once(self):
+        first, second = self._job(), self._job()
+        
+        job = claim_job()
+        self.assertEqual(job.id, first.id)
+        self.assertEqual((job.status, job.tries), ('running', 1))
+        self.assertIsNone(claim_job(first.id))
+        self.assertEqual(claim_job().id, second.id)
+        self.assertIsNone(claim_job())
+    
+    def test_completed_job_records_the_attempt(self):
+        job = claim_job(self._job().id)
+        with override_settings(MEDIA_ROOT=self.media_root):
+            run_speaking_job(job, FakeSpeechService())
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result['attempt_id'], str(job.attempt_id))
+        self.assertEqual(job.attempt.score, 95)
+    
+    def test_failed_job_keeps_the_error_and_drops_the_audio(self):
+        job = claim_job(self._job().id)
+        with override_settings(MEDIA_ROOT=self.media_root):
+            run_speaking_job(job, FakeSpeechService(RuntimeError('decoder crashed')))
+            self.assertFalse(default_storage.exists(job.audio_path))
+        
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'decoder crashed'))
+        self.assertIsNone(job.attempt)
+    
+    def test_backend_that_fails_to_load_fails_the_job(self):
+        job = claim_job(self._job().id)
+        with override_settings(MEDIA_ROOT=self.media_root), \
+                mock.patch('practice.jobs.SpeechRecognitionService', side_effect=ImportError('no whisper')):
+            run_speaking_job(job)
+        
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'no whisper'))
+    
+    def test_stale_jobs_are_requeued_until_out_of_tries(self):
+        long_ago = timezone.now() - timedelta(minutes=5)
+        retry = self._job(status='running', tries=1, started_at=long_ago)
+        give_up = self._job(status='running', tries=2, started_at=long_ago)
+        fresh = self._job(status='running', tries=1, started_at=timezone.now())
+        
+        self.assertEqual(requeue_stale_jobs(), (1, 1))
+        statuses = dict(SpeakingJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {retry.id: 'queued', give_up.id: 'failed', fresh.id: 'running'})
+
+
+class FakeStreamService(SpeechRecognitionService):
+    def __init__(self):
+        super().__init__(model_size='base')
+    
+    def transcribe_audio(self, audio, language, model_size):
+        return 'bonjour'
+
+
+@skipIf(WebsocketCommunicator is None, 'channels.testing is not available')
+@override_settings(SPEAKING_AUDIO_TRANSCODE=False)
+class SpeakingStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        
+        self.user = User.objects.create_user('student@example.com', 'Passw0rd!', username='student')
+        language = Language.objects.create(code='fr', name='French', native_name='Français', flag_emoji='🇫🇷')
+        course = Course.objects.create(language=language, title='French A1', description='Basics')
+        module = Module.objects.create(course=course, title='Greetings', order_index=1)
+        lesson = Lesson.objects.create(module=module, title='Bonjour', order_index=1)
+        self.exercise = Exercise.objects.create(lesson=lesson, exercise_type='speaking', title='Say hello',
+                                                correct_answer='bonjour', order_index=1)
+        
+        self.controller = AdmissionController(max_in_flight=4, per_user=1, max_waiting=0,
+                                              wait_timeout=0, retry_after=5)
+        for target, value in (('get_admission_controller', lambda: self.controller),
+                              ('SpeechRecognitionService', FakeStreamService)):
+            patcher = mock.patch(f'practice.consumers.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+    
+    def _communicator(self, exercise_id=None):
+        exercise_id = str(exercise_id or self.exercise.id)
+        communicator = WebsocketCommunicator(SpeakingConsumer.as_asgi(), f'/ws/practice/speaking/{exercise_id}/')
+        communicator.scope['user'] = self.user
+        communicator.scope['url_route'] = {'kwargs': {'exercise_id': exercise_id}}
+        return communicator
+    
+    async def test_stream_is_scored_and_recorded(self):
+        communicator = self._communicator()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        
+        await communicator.send_json_to({'type': 'start', 'language': 'fr'})
+        await communicator.send_to(bytes_data=b'\x00\x01' * 8000)
+        await communicator.send_json_to({'type': 'stop'})
+        message = await communicator.receive_json_from(timeout=5)
+        while message['type'] == 'partial':
+            message = await communicator.receive_json_from(timeout=5)
+        
+        self.assertEqual(message['type'], 'final')
+        self.assertEqual(message['analysis']['transcription'], 'bonjour')
+        attempt = await database_sync_to_async(ExerciseAttempt.objects.get)(id=message['attempt_id'])
+        self.assertTrue(default_storage.exists(attempt.audio_url))
+        
+        await communicator.disconnect()
+        self.assertEqual(self.controller._in_flight, 0)
+    
+    async def test_malformed_exercise_id_is_refused(self):
+        connected, code = await self._communicator('not-a-uuid').connect()
+        self.assertEqual((connected, code), (False, CLOSE_BAD_REQUEST))
+        self.assertEqual(self.controller._in_flight, 0)
+    
+    async def test_malformed_frame_closes_the_stream(self):
+        communicator = self._communicator()
+        await communicator.connect()
+        await communicator.send_to(text_data='{not json')
+        
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': CLOSE_BAD_REQUEST})
+        await communicator.disconnect()
+        self.assertEqual(self.controller._in_flight, 0)
+    
+    async def test_second_stream_of_one_user_is_shed_until_the_first_ends(self):
+        first = self._communicator()
+        self.assertTrue((await first.connect())[0])
+        
+        connected, code = await self._communicator().connect()
+        self.assertEqual((connected, code), (False, CLOSE_UNAVAILABLE))
+        
+        await first.disconnect()
+        again = self._communicator()
+        self.assertTrue((await again.connect())[0])
+        await again.disconnect()
+
+
+@override_settings(SPEECH_VAD_ENABLED=False, WHISPER_INT8_MODELS=[])
+class TranscriptionCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches[settings.TRANSCRIPTION_CACHE_ALIAS].clear()
+    
+    def test_file_digest_is_the_sha256_of_the_whole_file(self):
+        content = os.urandom(3 * 1024 * 1024 + 17)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(content)
+            f.flush()
+            self.assertEqual(file_digest(f.name), hashlib.sha256(content).hexdigest())
+    
+    def test_entries_are_keyed_by_digest_model_and_language(self):
+        cache_transcription('abc', 'base', 'fr', {'text': 'bonjour', 'segments': []})
+        
+        self.assertEqual(get_cached_transcription('abc', 'base', 'fr'), {'text': 'bonjour'})
+        self.assertIsNone(get_cached_transcription('abd', 'base', 'fr'))
+        self.assertIsNone(get_cached_transcription('abc', 'base-int8', 'fr'))
+        self.assertIsNone(get_cached_transcription('abc', 'small', 'fr'))
+        self.assertIsNone(get_cached_transcription('abc', 'base', 'en'))
+    
+    def test_full_cache_evicts_only_the_least_recently_used_entry(self):
+        options = settings.CACHES[settings.TRANSCRIPTION_CACHE_ALIAS]['OPTIONS']
+        self.assertEqual(options['CULL_FREQUENCY'], options['MAX_ENTRIES'])
+        
+        location = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'transcription-lru-test',
+            'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+        }
+        with self.settings(CACHES={**settings.CACHES, settings.TRANSCRIPTION_CACHE_ALIAS: location}):
+            for digest in ('a', 'b', 'c'):
+                cache_transcription(digest, 'base', 'fr', {'text': digest})
+            get_cached_transcription('a', 'base', 'fr')
+            cache_transcription('d', 'base', 'fr', {'text': 'd'})
+            
+            kept = [digest for digest in 'abcd' if get_cached_transcription(digest, 'base', 'fr')]
+        self.assertEqual(kept, ['a', 'c', 'd'])
+    
+    def test_hit_skips_inference(self):
+        service = SpeechRecognitionService(model_size='base', backend=mock.Mock())
+        cache_transcription('abc', 'base', 'fr', {'text': ' bonjour '})
+        
+        with mock.patch.object(service, '_transcribe') as transcribe:
+            result = service.analyze_pronunciation('unused.wav', 'bonjour', 'fr', audio_digest='abc')
+        
+        transcribe.assert_not_called()
+        service.backend.load_audio.assert_not_called()
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['transcription'], 'bonjour')
+    
+    def test_miss_transcribes_once_and_caches_the_text(self):
+        backend = mock.Mock()
+        backend.load_audio.return_value = np.zeros(16000, dtype=np.float32)
+        service = SpeechRecognitionService(model_size='base', backend=backend)
+        
+        with mock.patch.object(service, '_transcribe', return_value={'text': 'bonjour'}) as transcribe:
+            first = service.analyze_pronunciation('clip.wav', 'bonjour', 'fr', audio_digest='abc')
+            second = service.analyze_pronunciation('clip.wav', 'bonjour', 'fr', audio_digest='abc')
+        
+        transcribe.assert_called_once()
+        self.assertEqual((first['cached'], second['cached']), (False, True))
+
+
+class TrimSilenceTests(SimpleTestCase):
+    def _tone(self, seconds, amplitude=0.5):
+        t = np.arange(int(seconds * 16000)) / 16000
+        return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    
+    def _silence(self, seconds):
+        return np.zeros(int(seconds * 16000), dtype=np.float32)
+    
+    def test_all_silence_is_rejected(self):
+        audio, report = trim_silence(self._silence(2))
+        self.assertIsNone(audio)
+        self.assertEqual((report['kept_seconds'], report['trimmed_seconds']), (0.0, 2.0))
+    
+    def test_speech_without_silence_is_kept_whole(self):
+        tone = self._tone(1.5)
+        audio, report = trim_silence(tone)
+        self.assertEqual(len(audio), len(tone))
+        self.assertEqual(report['trimmed_seconds'], 0)
+    
+    def test_silent_edges_are_cut_down_to_the_padding(self):
+        clip = np.concatenate([self._silence(1), self._tone(0.5), self._silence(1)])
+        audio, report = trim_silence(clip, padding_ms=250)
+        
+        # 0.5 s of speech plus 250 ms either side, to within a 30 ms frame.
+        self.assertAlmostEqual(report['kept_seconds'], 1.0, delta=0.06)
+        self.assertAlmostEqual(report['start_seconds'], 0.75, delta=0.03)
+        self.assertAlmostEqual(report['trimmed_seconds'], 1.5, delta=0.06)
+        self.assertEqual(len(audio), round(report['kept_seconds'] * 16000))
+    
+    def test_padding_never_reaches_past_the_clip(self):
+        clip = np.concatenate([self._tone(0.5), self._silence(1)])
+        audio, report = trim_silence(clip, padding_ms=250)
+        self.assertEqual(report['start_seconds'], 0)
+        self.assertAlmostEqual(report['kept_seconds'], 0.75, delta=0.03)
+    
+    def test_saved_time_is_credited_at_the_measured_rate(self):
+        report = {'original_seconds': 4.0, 'kept_seconds': 1.0, 'trimmed_seconds': 3.0}
+        SpeechRecognitionService(model_size='base')._report_savings(report, 0.5)
+        self.assertEqual(report['inference_seconds'], 0.5)
+        self.assertEqual(report['estimated_seconds_saved'], 1.5)
+
+
+class AlignmentTests(SimpleTestCase):
+    def test_inserted_word_costs_one_error(self):
+        alignment = align_words('Je mange une pomme.', 'je mange euh une pomme')
+        
+        self.assertEqual(alignment['hits'], 4)
+        self.assertEqual(alignment['insertions'], 1)
+        self.assertEqual(alignment['substitutions'] + alignment['deletions'], 0)
+        self.assertEqual(alignment['wer'], 25)
+    
+    def test_batch_matches_single_pairs(self):
+        pairs = [
+            ('bonjour le monde', 'bonjour monde'),
+            ('il fait beau aujourd\'hui', 'il fait chaud'),
+            ('', 'merci'),
+            ('au revoir', ''),
+        ]
+        
+        self.assertEqual(align_words_batch(pairs), [align_words(*pair) for pair in pairs])
+    
+    def test_chunks_stay_within_the_cell_budget(self):
+        pairs = [(' '.join(['mot'] * n), ' '.join(['mot'] * (n + 1))) for n in (1, 2, 6, 3, 9)]
+        expected = [align_words(*pair) for pair in pairs]
+        
+        with mock.patch('practice.alignment.CELL_BUDGET', 60), mock.patch('practice.alignment.SCALAR_CELLS', 0), \
+                mock.patch('practice.alignment._distance_matrices', wraps=alignment._distance_matrices) as fill:
+            self.assertEqual(align_words_batch(pairs), expected)
+        self.assertEqual(fill.call_count, 3)
+        for (refs, hyps), _ in fill.call_args_list:
+            cells = len(refs) * (max(map(len, refs)) + 1) * (max(map(len, hyps)) + 1)
+            self.assertTrue(len(refs) == 1 or cells <= 60)
+    
+    def test_char_similarity_ignores_case_and_punctuation(self):
+        self.assertEqual(char_similarity('Bonjour, Paul !', 'bonjour paul'), 1.0)
+        self.assertAlmostEqual(char_similarity('chat', 'chats'), 0.8)
+    
+    def test_batch_scoring_matches_single_scoring(self):
+        service = SpeechRecognitionService(model_size='base')
+        items = [('bonjour le monde', 'Bonjour tout le monde', 'fr'), ('hello', 'hello there', 'en')]
+        
+        self.assertEqual(service.score_transcriptions(items),
+                         [service.score_transcription(*item) for item in items])
+
+
+@skipIf(importlib.util.find_spec('torch') is None or importlib.util.find_spec('whisper') is None,
+        'torch and whisper are not installed')
+class WhisperBackendTests(SimpleTestCase):
+    def _tiny_whisper(self):
+        from whisper.model import ModelDimensions, Whisper
+        
+        dims = ModelDimensions(n_mels=80, n_audio_ctx=8, n_audio_state=8, n_audio_head=2, n_audio_layer=1,
+                               n_vocab=16, n_text_ctx=8, n_text_state=8, n_text_head=2, n_text_layer=1)
+        return Whisper(dims)
+    
+    def test_int8_quantizes_whisper_linear_layers(self):
+        import torch
+        import whisper
+        
+        model = self._tiny_whisper()
+        with mock.patch.object(whisper, 'load_model', return_value=model) as load_model, \
+                mock.patch.object(torch.ao.quantization, 'quantize_dynamic') as quantize_dynamic:
+            self.assertIs(WhisperBackend().load_model('base', precision='int8'), quantize_dynamic.return_value)
+        
+        load_model.assert_called_once_with('base', device='cpu')
+        quantize_dynamic.assert_called_once_with(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        # quantize_dynamic matches by exact type, so whisper's subclass must be gone.
+        self.assertFalse(any(isinstance(module, whisper.model.Linear) for module in model.modules()))
+        self.assertTrue(any(type(module) is torch.nn.Linear for module in model.modules()))
+    
+    def test_unknown_precision_is_rejected(self):
+        with self.assertRaises(ValueError):
+            WhisperBackend().load_model('base', precision='fp8')
+    
+    def test_fp32_on_cpu_loads_through_mmap_when_enabled(self):
+        import torch
+        
+        backend = WhisperBackend()
+        with self.settings(WHISPER_MMAP_WEIGHTS=True), \
+                mock.patch.object(torch.cuda, 'is_available', return_value=False), \
+                mock.patch.object(backend, '_load_mmap') as load_mmap:
+            self.assertIs(backend.load_model('base'), load_mmap.return_value)
+        load_mmap.assert_called_once_with('base')
+    
+    def test_mmap_loads_an_fp32_copy_of_the_checkpoint_without_copying(self):
+        import torch
+        
+        source = self._tiny_whisper()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        checkpoint_path = os.path.join(directory, 'tiny.pt')
+        torch.save({
+            'dims': source.dims.__dict__,
+            'model_state_dict': {key: value.half() for key, value in source.state_dict().items()},
+        }, checkpoint_path)
+        
+        with self.settings(WHISPER_MMAP_DIR=os.path.join(directory, 'mmap')), \
+                mock.patch.object(torch, 'load', wraps=torch.load) as load:
+            model = WhisperBackend()._load_mmap(checkpoint_path)
+        
+        self.assertTrue(os.path.exists(os.path.join(directory, 'mmap', 'tiny-fp32.pt')))
+        self.assertTrue(load.call_args.kwargs['mmap'])
+        for key, value in model.state_dict().items():
+            self.assertEqual(value.dtype, torch.float32)
+            self.assertTrue(torch.equal(value, source.state_dict()[key].half().float()))
+    
+    def test_mmap_falls_back_to_load_model_without_private_whisper_api(self):
+        import whisper
+        
+        with mock.patch.object(whisper, '_download', None, create=True), \
+                mock.patch.object(whisper, 'load_model') as load_model:
+            self.assertIs(WhisperBackend()._load_mmap('base'), load_model.return_value)
+        load_model.assert_called_once_with('base')
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from LinguaMaster.metrics import metrics
+
+
+def queued_job_depth():
+    from .models import SpeakingJob
+    return SpeakingJob.objects.filter(status='queued').count()
+
+
+class AdaptiveTierPolicy:
+    """Picks the most accurate model tier whose predicted latency meets the
+    SLO. The prediction is the tier's recent p95 inference time stretched by
+    the backlog waiting ahead of the request:
+
+        p95 * (1 + queue_depth / capacity)
+
+    Tiers without samples yet are tried optimistically so they can be
+    measured; when no tier fits, the fastest one is used."""
+
+    def __init__(self, tiers, slo_seconds, capacity=1, window=200,
+                 depth_func=queued_job_depth, depth_ttl=1.0):
+        self.tiers = list(tiers)
+        self.slo_seconds = slo_seconds
+        self.capacity = max(1, capacity)
+        self.depth_func = depth_func
+        self.depth_ttl = depth_ttl
+        self._latencies = {tier: deque(maxlen=window) for tier in self.tiers}
+        self._lock = threading.Lock()
+        self._depth = (0, 0.0)
+
+    def record(self, tier, seconds):
+        with self._lock:
+            self._latencies[tier].append(seconds)
+
+    def p95(self, tier):
+        with self._lock:
+            samples = sorted(self._latencies[tier])
+        if not samples:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def queue_depth(self):
+        depth, checked_at = self._depth
+        if time.monotonic() - checked_at > self.depth_ttl:
+            depth = self.depth_func()
+            self._depth = (depth, time.monotonic())
+        return depth
+
+    def choose(self):
+        depth = self.queue_depth()
+        stretch = 1 + depth / self.capacity
+
+        decision = {'queue_depth': depth, 'slo_seconds': self.slo_seconds}
+        for tier in reversed(self.tiers):
+            p95 = self.p95(tier)
+            if p95 is None or p95 * stretch <= self.slo_seconds:
+                decision.update(tier=tier, p95_seconds=p95,
+                                predicted_seconds=p95 * stretch if p95 is not None else None)
+                break
+        else:
+            tier = self.tiers[0]
+            p95 = self.p95(tier)
+            decision.update(tier=tier, p95_seconds=p95, predicted_seconds=p95 * stretch,
+                            slo_missed=True)
+
+        metrics.incr(f"speech.tier.{decision['tier']}")
+        return decision
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_tier_policy():
+    global _policy
+    if not settings.WHISPER_MODEL_TIERS:
+        return None
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = AdaptiveTierPolicy(
+                    settings.WHISPER_MODEL_TIERS,
+                    settings.WHISPER_LATENCY_SLO_MS / 1000,
+                    capacity=settings.WHISPER_MAX_CONCURRENCY
+                )
+    return _policy
@@ -0,0 +1,74 @@
+import logging
+import os
+import shutil
+import subprocess
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from LinguaMaster.metrics import metrics
+from .models import ExerciseAttempt
+
+logger = logging.getLogger(__name__)
+
+OPUS_SUFFIX = '.opus.ogg'
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def encode_opus(source_path, target_path, bitrate):
+    if shutil.which('ffmpeg') is None:
+        raise TranscodeError('ffmpeg not found')
+
+    # Speech needs neither stereo nor more than 16 kHz (what Whisper reads).
+    result = subprocess.run([
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', source_path,
+        '-vn', '-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', bitrate,
+        '-application', 'voip', target_path
+    ], capture_output=True)
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.decode(errors='replace').strip())
+
+
+def transcode_attempt_audio(attempt_id, storage=None):
+    """Re-encodes an attempt's audio as mono Opus and repoints audio_url to
+    it, recording the size before and after. Returns (original, stored)
+    sizes in bytes, or None if the attempt was left as it was."""
+    storage = storage or default_storage
+    attempt = ExerciseAttempt.objects.filter(id=attempt_id).values('audio_url').first()
+    name = attempt and attempt['audio_url']
+    if not name or name.endswith('.ogg') or not storage.exists(name):
+        return None
+
+    original_size = storage.size(name)
+    new_name = storage.get_available_name(os.path.splitext(name)[0] + OPUS_SUFFIX)
+    try:
+        encode_opus(storage.path(name), storage.path(new_name), settings.SPEAKING_AUDIO_OPUS_BITRATE)
+    except TranscodeError as e:
+        logger.warning('Could not transcode %s: %s', name, e)
+        metrics.incr('speaking.transcode.failed')
+        storage.delete(new_name)
+        return None
+
+    new_size = storage.size(new_name)
+    if new_size >= original_size:
+        storage.delete(new_name)
+        ExerciseAttempt.objects.filter(id=attempt_id, audio_url=name).update(
+            audio_original_bytes=original_size, audio_bytes=original_size
+        )
+        return None
+
+    # Only repoint if the attempt still refers to the file we encoded.
+    updated = ExerciseAttempt.objects.filter(id=attempt_id, audio_url=name).update(
+        audio_url=new_name, audio_original_bytes=original_size, audio_bytes=new_size
+    )
+    if not updated:
+        storage.delete(new_name)
+        return None
+
+    storage.delete(name)
+    metrics.incr('speaking.transcode.done')
+    metrics.observe('speaking.transcode.bytes_saved', original_size - new_size)
+    return original_size, new_size
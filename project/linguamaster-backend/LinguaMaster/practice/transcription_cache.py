@@ -0,0 +1,35 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from LinguaMaster.metrics import metrics
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(digest, model_size, language):
+    return f'transcription:{model_size}:{language}:{digest}'
+
+
+def get_cached_transcription(digest, model_size, language):
+    result = caches[settings.TRANSCRIPTION_CACHE_ALIAS].get(_cache_key(digest, model_size, language))
+    metrics.incr('speech.cache.hits' if result is not None else 'speech.cache.misses')
+    return result
+
+
+def cache_transcription(digest, model_size, language, result):
+    # Only the transcript is worth keeping; scoring is re-run against the
+    # reference text of whichever exercise the clip is submitted to.
+    caches[settings.TRANSCRIPTION_CACHE_ALIAS].set(
+        _cache_key(digest, model_size, language),
+        {'text': result['text']}
+    )
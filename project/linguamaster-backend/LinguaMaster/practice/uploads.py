@@ -0,0 +1,116 @@
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+
+from LinguaMaster.metrics import metrics
+
+
+SPEAKING_AUDIO_DIR = 'speaking_practice'
+
+
+def sharded_name(key, file_name):
+    # Two levels of 256 directories keyed by a hex digest, so no single
+    # directory grows without bound.
+    return f"{SPEAKING_AUDIO_DIR}/{key[:2]}/{key[2:4]}/{file_name}"
+
+
+def speaking_storage_name(file_name):
+    key = uuid.uuid4().hex
+    return sharded_name(key, f"{key}_{file_name}")
+
+
+class StoredAudioFile(UploadedFile):
+    """An upload that already lives at its final storage name."""
+
+    def __init__(self, storage, storage_name, name, content_type, size, charset,
+                 content_type_extra=None, sha256=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.storage = storage
+        self.storage_name = storage_name
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.storage.path(self.storage_name)
+
+    def open(self, mode='rb'):
+        self.file = open(self.temporary_file_path(), mode)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class SpeakingUploadHandler(FileUploadHandler):
+    """Streams the `audio` part of a multipart body chunk by chunk into its
+    final file under MEDIA_ROOT, hashing it on the way, and gives up as soon
+    as SPEAKING_UPLOAD_MAX_BYTES is exceeded. Nothing is held in memory
+    beyond one parser chunk, and the rest of an oversized body is never
+    read."""
+
+    field_name = 'audio'
+
+    def __init__(self, request=None, storage=None, max_bytes=None):
+        super().__init__(request)
+        self.storage = storage or default_storage
+        self.max_bytes = max_bytes or settings.SPEAKING_UPLOAD_MAX_BYTES
+        self.too_large = False
+        self.storage_name = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != self.field_name or self.storage_name is not None:
+            raise SkipFile()
+        if self.content_length is not None and self.content_length > self.max_bytes:
+            self.too_large = True
+            raise StopUpload(connection_reset=True)
+
+        self.storage_name = self.storage.get_available_name(
+            speaking_storage_name(self.storage.get_valid_name(file_name))
+        )
+        path = self.storage.path(self.storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.file = open(path, 'wb')
+        self.digest = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.too_large = True
+            self._discard()
+            raise StopUpload(connection_reset=True)
+
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        metrics.observe('speaking.upload.bytes', file_size)
+        return StoredAudioFile(
+            self.storage,
+            self.storage_name,
+            self.file_name,
+            self.content_type,
+            file_size,
+            self.charset,
+            self.content_type_extra,
+            sha256=self.digest.hexdigest()
+        )
+
+    def upload_interrupted(self):
+        if self.storage_name is not None and not self.file.closed:
+            self._discard()
+
+    def _discard(self):
+        self.file.close()
+        self.storage.delete(self.storage_name)
+        self.storage_name = None
+        metrics.incr('speaking.upload.rejected')
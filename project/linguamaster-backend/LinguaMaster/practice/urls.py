@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('enroll/', views.StudentEnrollmentView.as_view(), name='enroll'),
     path('speaking/', views.SpeakingPracticeView.as_view(), name='speaking_practice'),
+    path('speaking/jobs/<uuid:job_id>/', views.SpeakingJobView.as_view(), name='speaking_job'),
+    path('attempts/<uuid:attempt_id>/audio/', views.AttemptAudioView.as_view(), name='attempt_audio'),
     path('progress/', views.ProgressView.as_view(), name='progress'),
 ]
\ No newline at end of file
@@ -1,13 +1,21 @@
 from rest_framework import views, status, permissions
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-import uuid
-import json
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from .models import StudentEnrollment, LessonProgress, ExerciseAttempt
+from LinguaMaster.media import MediaTokenAuthentication, serve_media, signed_media_url
+
+from .models import StudentEnrollment, LessonProgress, ExerciseAttempt, SpeakingJob
 from .services import SpeechRecognitionService
+from .jobs import record_speaking_attempt, analysis_summary, enqueue_speaking_job, schedule_transcode
+from .uploads import SpeakingUploadHandler
+from .admission import AdmissionRejected, check_job_backlog, get_admission_controller
+from .media import can_read_media
 from courses.models import Exercise
 
 class StudentEnrollmentView(views.APIView):
@@ -35,63 +43,141 @@ class SpeakingPracticeView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
+        # Shed before the upload is read: a rejected client costs us headers only
+        try:
+            if settings.SPEAKING_QUEUE_BACKEND != 'sync':
+                check_job_backlog(request.user)
+            with get_admission_controller().admit(request.user.pk):
+                return self._handle_upload(request)
+        except AdmissionRejected as e:
+            response = Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+    
+    def _handle_upload(self, request):
+        # Must be installed before request.data / request.FILES are touched
+        upload_handler = SpeakingUploadHandler(request)
+        request.upload_handlers = [upload_handler]
+        
         audio_file = request.FILES.get('audio')
         exercise_id = request.data.get('exercise_id')
         reference_text = request.data.get('reference_text')
         language = request.data.get('language', 'fr')
         
+        if upload_handler.too_large:
+            if audio_file:
+                default_storage.delete(audio_file.storage_name)
+            return Response({'error': f'audio must be at most {upload_handler.max_bytes} bytes'},
+                           status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
         if not audio_file or not exercise_id:
+            if audio_file:
+                default_storage.delete(audio_file.storage_name)
             return Response({'error': 'audio and exercise_id required'}, 
                            status=status.HTTP_400_BAD_REQUEST)
         
-        filename = f"speaking_practice/{uuid.uuid4()}_{audio_file.name}"
-        saved_path = default_storage.save(filename, ContentFile(audio_file.read()))
+        saved_path = audio_file.storage_name
         
         try:
             exercise = Exercise.objects.get(id=exercise_id)
+            
+            if settings.SPEAKING_QUEUE_BACKEND != 'sync':
+                job = enqueue_speaking_job(request.user, exercise, saved_path,
+                                           reference_text, language, audio_file.sha256)
+                return Response({
+                    'success': True,
+                    'job_id': str(job.id),
+                    'status': job.status,
+                    'status_url': reverse('speaking_job', kwargs={'job_id': job.id})
+                }, status=status.HTTP_202_ACCEPTED)
+            
             speech_service = SpeechRecognitionService()
             
-            temp_file_path = default_storage.path(saved_path)
             analysis_result = speech_service.analyze_pronunciation(
-                temp_file_path,
+                audio_file.temporary_file_path(),
                 reference_text or exercise.correct_answer,
-                language
+                language,
+                audio_digest=audio_file.sha256,
+                exercise_id=exercise.id
             )
             
+            if analysis_result.get('no_speech'):
+                default_storage.delete(saved_path)
+                return Response({'error': analysis_result['error']},
+                               status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            
             if not analysis_result['success']:
                 return Response({'error': analysis_result.get('error')}, 
                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            attempt = ExerciseAttempt.objects.create(
-                student=request.user,
-                exercise=exercise,
-                user_answer=analysis_result['transcription'],
-                audio_url=saved_path,
-                transcription=analysis_result['transcription'],
-                confidence_score=analysis_result.get('confidence', 0),
-                pronunciation_score=analysis_result['score'],
-                feedback=json.dumps(analysis_result['feedback']),
-                whisper_analysis=json.dumps(analysis_result),
-                is_correct=analysis_result['score'] >= 70,
-                score=int(analysis_result['score'])
-            )
+            attempt = record_speaking_attempt(request.user, exercise, saved_path, analysis_result)
+            schedule_transcode(attempt)
             
             return Response({
                 'success': True,
                 'attempt_id': str(attempt.id),
-                'analysis': {
-                    'transcription': analysis_result['transcription'],
-                    'confidence': analysis_result.get('confidence', 0),
-                    'accuracy': analysis_result['accuracy'],
-                    'score': analysis_result['score'],
-                    'feedback': analysis_result['feedback']
-                }
+                'analysis': analysis_summary(analysis_result),
+                'audio_url': attempt_audio_url(attempt.id, request.user)
             })
             
+        except AdmissionRejected:
+            default_storage.delete(saved_path)
+            raise
         except Exception as e:
             default_storage.delete(saved_path)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class SpeakingJobView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(SpeakingJob, id=job_id, student=request.user)
+        
+        data = {
+            'job_id': str(job.id),
+            'status': job.status,
+            'created_at': job.created_at,
+            'finished_at': job.finished_at
+        }
+        if job.status == 'done':
+            data.update(job.result or {})
+            if job.attempt_id:
+                data['audio_url'] = attempt_audio_url(job.attempt_id, request.user)
+        elif job.status == 'failed':
+            data['error'] = job.error
+        
+        return Response(data)
+
+def attempt_audio_url(attempt_id, user):
+    return signed_media_url(reverse('attempt_audio', kwargs={'attempt_id': attempt_id}), user)
+
+class AttemptAudioView(views.APIView):
+    """The attempt's current recording; stays valid when the stored file is
+    transcoded or moved."""
+    authentication_classes = [MediaTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, attempt_id):
+        attempts = ExerciseAttempt.objects.all()
+        if not request.user.is_staff:
+            attempts = attempts.filter(student=request.user)
+        attempt = get_object_or_404(attempts.only('audio_url'), id=attempt_id)
+        if not attempt.audio_url:
+            raise Http404
+        return serve_media(request, attempt.audio_url)
+
+class MediaView(views.APIView):
+    authentication_classes = [MediaTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    # Public course media must load in <img>/<audio> tags, which send no
+    # Authorization header; can_read_media decides per file.
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, name):
+        # 404 rather than 403: no hint that someone else's file exists
+        if not can_read_media(request.user, name):
+            raise Http404
+        return serve_media(request, name)
+
 class ProgressView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
     